@@ -616,12 +616,11 @@ def test_devices(test_context, module_device_setup):
         pytest.fail("test_devices fixture requires a multi-device marker, e.g. @pytest.mark.device('D400*', 'D400*')")
 
     serial_numbers = module_device_setup
-    device_list = []
-    for sn in serial_numbers:
-        for dev in test_context.devices:
-            if dev.supports(rs.camera_info.serial_number) and dev.get_info(rs.camera_info.serial_number) == sn:
-                device_list.append(dev)
-                break
+    # query each device's serial number once, rather than once per requested serial
+    devices_by_sn = {dev.get_info(rs.camera_info.serial_number): dev
+                     for dev in test_context.devices
+                     if dev.supports(rs.camera_info.serial_number)}
+    device_list = [devices_by_sn[sn] for sn in serial_numbers if sn in devices_by_sn]
 
     if len(device_list) < len(serial_numbers):
         pytest.fail(f"Expected {len(serial_numbers)} devices in context but found {len(device_list)}")
@@ -19,23 +19,30 @@ def test_depth_imu_extrinsics(test_device):
     device, _ = test_device
     device_name = device.get_info( rs.camera_info.name )
 
-    sensors = {sensor.get_info( rs.camera_info.name ) : sensor for sensor in device.query_sensors()}
+    # only the stereo and motion modules are needed; stop querying sensor names once both are found
+    stereo_module = motion_module = None
+    for sensor in device.query_sensors():
+        name = sensor.get_info( rs.camera_info.name )
+        if name == 'Stereo Module':
+            stereo_module = sensor
+        elif name == 'Motion Module':
+            motion_module = sensor
+        if stereo_module is not None and motion_module is not None:
+            break
 
-    if 'Motion Module' not in sensors:
+    if motion_module is None:
         pytest.skip("device has no Motion Module")
 
     depth_profile = rs.stream_profile()
     imu_profile = rs.stream_profile()
 
-    sensor = sensors['Stereo Module']
-    for profile in sensor.get_stream_profiles() :
+    for profile in stereo_module.get_stream_profiles() :
         if profile.stream_type() == rs.stream.depth:
             depth_profile = profile
             break
 
-    sensor = sensors['Motion Module']
-    log.debug("Found Sensor: " +  sensor.get_info(rs.camera_info.name) + " of type: " + device.get_info(rs.camera_info.imu_type))
-    for profile in sensor.get_stream_profiles() :
+    log.debug("Found Sensor: Motion Module of type: " + device.get_info(rs.camera_info.imu_type))
+    for profile in motion_module.get_stream_profiles() :
         if profile.stream_type() == rs.stream.motion: # For combined motion profiles.
             imu_profile = profile
             break
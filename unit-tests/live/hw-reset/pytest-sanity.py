@@ -4,7 +4,8 @@
 import pytest
 import pyrealsense2 as rs
 from rspy import devices
-from rspy.timer import Timer
+from rspy.stopwatch import Stopwatch
+from rspy.timer import wait_for
 import time
 import logging
 log = logging.getLogger(__name__)
@@ -41,7 +42,6 @@ def test_hw_reset_sanity( test_device ):
     device_removed_time = 0
     device_added_time = 0
 
-    t = Timer( 10 )
     dev, ctx = test_device
     target_sn = dev.get_info( rs.camera_info.serial_number )
     ctx.set_devices_changed_callback( device_changed )
@@ -50,26 +50,18 @@ def test_hw_reset_sanity( test_device ):
     dev.hardware_reset()
 
     log.info( "Pending for device removal" )
-    t.start()
-    while not t.has_expired():
-        if (device_removed):
-            break
-        time.sleep( 0.1 )
+    wait_for( lambda: device_removed, 10 )
 
     assert device_removed, "device was not removed after hardware_reset"
 
     log.info( "Pending for device addition" )
-    t = Timer( devices.MAX_ENUMERATION_TIME )
-    t.start()
-    while not t.has_expired():
-        if ( device_added ):
-            break
-        time.sleep(0.1)
+    sw = Stopwatch()
+    wait_for( lambda: device_added, devices.MAX_ENUMERATION_TIME )
 
     if device_added_time:
         log.info( "Device reset cycle took %s [sec]", device_added_time - device_removed_time )
     else:
-        log.error( "Device not connected back after %s [sec]", t.get_elapsed() )
+        log.error( "Device not connected back after %s [sec]", sw.get_elapsed() )
         log.info( "Querying there are %s devices", len( ctx.query_devices() ) )
 
     assert device_added, "device did not re-appear within MAX_ENUMERATION_TIME"
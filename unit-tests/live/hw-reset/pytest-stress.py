@@ -6,7 +6,7 @@
 import pytest
 import pyrealsense2 as rs
 from rspy import devices
-from rspy.timer import Timer
+from rspy.timer import wait_for
 from rspy.stopwatch import Stopwatch
 import time
 import logging
@@ -90,12 +90,7 @@ def test_hw_reset_stress( test_device, test_context_var ):
         # Use the sum of both timeouts: in the OS-race case (no removal event), the addition
         # can arrive after the full remove + reconnect cycle.
         first_timeout = REMOVAL_TIMEOUT + max_enum
-        t = Timer( first_timeout )
-        t.start()
-        while not t.has_expired():
-            if device_removed or device_added:
-                break
-            time.sleep( 0.05 )
+        wait_for( lambda: device_removed or device_added, first_timeout )
 
         if not device_removed and not device_added:
             log.error( f"[{i}/{iterations}] No device event within {first_timeout} [sec]" )
@@ -110,12 +105,7 @@ def test_hw_reset_stress( test_device, test_context_var ):
 
         # --- wait for reconnect (may already be set) ---
         if not device_added:
-            t = Timer( max_enum )
-            t.start()
-            while not t.has_expired():
-                if device_added:
-                    break
-                time.sleep( 0.05 )
+            wait_for( lambda: device_added, max_enum )
 
         added_time = sw.get_elapsed()
 
@@ -15,46 +15,106 @@ HEIGHT = 720
 
 # transformation matrix from frame to aligned region of interest
 M = None
+# cv2.remap() lookup tables equivalent to warping by M, computed once per M (see find_roi_location):
+# fixed-point ones for interpolating warps, float ones for nearest-neighbor (see _roi_maps)
+_map1 = _map2 = None
+_nearest_map1 = _nearest_map2 = None
+# the same tables, uploaded for OpenCL use (see USE_OPENCL): interpolation -> (map1, map2)
+_umaps = {}
+
+# Warp full frames on the GPU through OpenCV's T-API (cv2.UMat) when OpenCL is available, falling back to the
+# CPU if it fails. Off unless IQ_USE_OPENCL=1 is set: GPU remap results may differ slightly from the CPU ones
+# our thresholds were tuned with, so validate on the target machines before enabling.
+# Availability is probed once, here, rather than per frame.
+USE_OPENCL = os.getenv('IQ_USE_OPENCL') == '1' and cv2.ocl.haveOpenCL()
+
+# ROI corners the page corners are mapped to: top-left, top-right, bottom-right, bottom-left
+ROI_CORNERS = np.array([[0,0],[WIDTH-1,0],[WIDTH-1,HEIGHT-1],[0,HEIGHT-1]], dtype=np.float32)
 
 def compute_homography(pts):
     """
     Given 4 points (the detected ArUco marker centers), find the 3×3 matrix that stretches/rotates
     the four ArUco points so they become the corners of an A4 page (used to "flatten" the page in an image)
     """
-    pts_sorted = sorted(pts, key=lambda p: (p[1], p[0]))
-    top_left, top_right = sorted(pts_sorted[:2], key=lambda p: p[0])
-    bottom_left, bottom_right = sorted(pts_sorted[2:], key=lambda p: p[0])
+    pts = np.asarray(pts, dtype=np.float32)
+    by_y = pts[np.lexsort((pts[:, 0], pts[:, 1]))]  # sorted by y, then x
+    top = by_y[:2][np.argsort(by_y[:2, 0], kind='stable')]
+    bottom = by_y[2:][np.argsort(by_y[2:, 0], kind='stable')]
 
-    src = np.array([top_left, top_right, bottom_right, bottom_left], dtype=np.float32)
-    dst = np.array([[0,0],[WIDTH-1,0],[WIDTH-1,HEIGHT-1],[0,HEIGHT-1]], dtype=np.float32)
-    M = cv2.getPerspectiveTransform(src, dst)
+    src = np.array([top[0], top[1], bottom[1], bottom[0]], dtype=np.float32)  # TL, TR, BR, BL
+    M = cv2.getPerspectiveTransform(src, ROI_CORNERS)
     return M  # we later use M to get our roi
 
 
+# ArUco marker detection function, built once by get_marker_detector()
+_detect_markers = None
+
+def get_marker_detector():
+    """
+    Build the ArUco dictionary/parameters/detector on first use and reuse them afterwards, instead of
+    reallocating them for every frame we look for the page in.
+    Returns a function taking an image and returning (corners, ids, rejected).
+    """
+    global _detect_markers
+    if _detect_markers is None:
+        aruco = cv2.aruco
+        dictionary = aruco.getPredefinedDictionary(aruco.DICT_4X4_1000)
+        try:
+            # new API (OpenCV >= 4.7)
+            detector = aruco.ArucoDetector(dictionary, aruco.DetectorParameters())
+            _detect_markers = detector.detectMarkers
+        except AttributeError:
+            # legacy API (OpenCV <= 4.6) - used on some of our machines
+            parameters = aruco.DetectorParameters_create()
+            _detect_markers = lambda img: aruco.detectMarkers(img, dictionary, parameters=parameters)
+    return _detect_markers
+
+
+# scale at which markers were last found -- tried first on the next frame
+_marker_scale = 0.5
+
+def find_markers(img, required_ids):
+    """
+    Detect ArUco markers on a half-resolution copy of the image first: detection cost scales with pixel
+    count, and our markers are big enough to be found at 640x360. Falls back to full resolution.
+    Returns (corners, ids) in full-resolution coordinates, or (None, None) if fewer than 3 of the
+    required markers were found at any scale.
+    """
+    global _marker_scale
+    if img.shape[0] <= 480:
+        scales = (1.0,)
+    elif _marker_scale == 1.0:
+        scales = (1.0, 0.5)
+    else:
+        scales = (0.5, 1.0)
+    # the detector works on grayscale anyway: convert color once, rather than per detection attempt, and
+    # resize a single channel; IR (y8) frames are already grayscale
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    for scale in scales:
+        scaled = gray if scale == 1.0 else cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        corners, ids, _ = get_marker_detector()(scaled)
+        if ids is None or np.count_nonzero(np.isin(required_ids, ids)) <= 2:
+            continue
+        _marker_scale = scale
+        if scale != 1.0:
+            # pixel i of the scaled image is centered on pixel (i + 0.5) / scale - 0.5 of the original
+            corners = tuple((c + 0.5) / scale - 0.5 for c in corners)
+        return corners, ids
+    return None, None
+
+
 def detect_a4_page(img, required_ids):
     """
-    Detect ArUco markers and return centers. Returns 4 points if all are found,
-    3 points if exactly one is missing (caller uses affine), or None otherwise.
+    Detect ArUco markers and return their centers, in required_ids order. If exactly one
+    is missing, its center is reconstructed from the other 3. Returns None if more are missing.
     """
-    # init aruco detector
-    aruco = cv2.aruco
-    dict_type = cv2.aruco.DICT_4X4_1000
-    dictionary = aruco.getPredefinedDictionary(dict_type)
-    try:
-        # new API (OpenCV >= 4.7)
-        parameters = aruco.DetectorParameters()
-        detector = aruco.ArucoDetector(dictionary, parameters)
-        corners, ids, _ = detector.detectMarkers(img)
-    except AttributeError:
-        # legacy API (OpenCV <= 4.6) - used on some of our machines
-        parameters = aruco.DetectorParameters_create()
-        corners, ids, _ = aruco.detectMarkers(img, dictionary, parameters=parameters)
-
-    if ids is None or len([rid for rid in required_ids if rid in ids]) <= 2:
+    corners, ids = find_markers(img, required_ids)
+    if ids is None:
         return None
 
-    id_to_corner = dict(zip(ids.flatten(), corners))  # map id to corners
-    values = [id_to_corner[rid][0].mean(axis=0) for rid in required_ids if rid in id_to_corner] # for each required id, get center of marker coords
+    centers = np.asarray(corners, dtype=np.float32).reshape(-1, 4, 2).mean(axis=1)  # centers of all markers at once
+    id_to_index = {int(rid): i for i, rid in enumerate(ids.ravel())}  # map id to its marker
+    values = [centers[id_to_index[rid]] for rid in required_ids if rid in id_to_index] # for each required id, get center of marker coords
 
     if len(values) == 3:
         # Reconstruct missing 4th corner. The page is rectangular, so opposite
@@ -70,24 +130,64 @@ def detect_a4_page(img, required_ids):
             diag1, diag2, third = b, c, a
         else:
             diag1, diag2, third = a, c, b
-        values.append(diag1 + diag2 - third)
-        missing = next(rid for rid in required_ids if rid not in id_to_corner)
+        missing = next(rid for rid in required_ids if rid not in id_to_index)
+        values.insert(list(required_ids).index(missing), diag1 + diag2 - third)  # keep required_ids order
         log.i(f"detect_a4_page: 3/4 markers found, reconstructed id {missing}")
 
     return np.array(values, dtype=np.float32)
 
 
-def find_roi_location(pipeline, required_ids, DEBUG_MODE=False, timeout=5):
+def latest_frames(pipeline):
+    """
+    Wait for a frameset, then drop any newer ones that already queued up, returning the most recent.
+    When processing is slower than the stream, plain wait_for_frames() would keep handing us stale frames.
+    """
+    frames = pipeline.wait_for_frames()
+    while True:
+        newer = pipeline.poll_for_frames()
+        if not newer:
+            return frames
+        frames = newer
+
+
+# metadata that auto-exposure adjusts while it converges
+_AE_METADATA = (rs.frame_metadata_value.actual_exposure, rs.frame_metadata_value.gain_level)
+
+def warmup(pipeline, max_frames=60, stable_frames=10, tolerance=0.01):
+    """
+    Skip the first frames of the stream until auto-exposure settles: returns once the exposure and gain of
+    every frame in the set have stayed within tolerance (relative) for stable_frames framesets in a row, or
+    after max_frames framesets. Without such metadata, all max_frames are skipped.
+    """
+    last = None
+    stable = 0
+    for i in range(max_frames):
+        frames = pipeline.wait_for_frames()
+        values = [f.get_frame_metadata(md) for f in frames for md in _AE_METADATA if f.supports_frame_metadata(md)]
+        if last and len(values) == len(last) and all(abs(v - l) <= tolerance * max(l, 1) for v, l in zip(values, last)):
+            stable += 1
+            if stable >= stable_frames:
+                log.d(f"exposure settled after {i + 1} frames")
+                return
+        else:
+            stable = 0
+        last = values
+
+
+def find_roi_location(pipeline, required_ids, DEBUG_MODE=False, timeout=5, on_miss=None):
     """
     Returns a matrix that transforms from frame to region of interest
-    This matrix will later be used with cv2.warpPerspective()
+    This matrix (via remap tables built from it) will later be used by get_roi_from_frame()
+    If given, on_miss(n) is called after each of the n frames the page was not found in, e.g. to
+    adjust the sensor while we keep looking
     """
-    global M
+    global M, _map1, _map2, _nearest_map1, _nearest_map2, _umaps
     # stream until page found
     page_pts = None
+    misses = 0
     start_time = time.time()
     while page_pts is None and time.time() - start_time < timeout:
-        frames = pipeline.wait_for_frames()
+        frames = latest_frames(pipeline)
         aruco_detectable_streams = (rs.stream.color, rs.stream.infrared) # we need one of those streams to detect ArUco markers
         frame = next(f for f in frames if f.get_profile().stream_type() in aruco_detectable_streams)
         img_bgr = np.asanyarray(frame.get_data())
@@ -97,6 +197,9 @@ def find_roi_location(pipeline, required_ids, DEBUG_MODE=False, timeout=5):
             cv2.waitKey(1)
 
         page_pts = detect_a4_page(img_bgr, required_ids)
+        if page_pts is None and on_miss:
+            misses += 1
+            on_miss(misses)
 
     if page_pts is None:
         log.e("Failed to detect page within timeout")
@@ -104,28 +207,110 @@ def find_roi_location(pipeline, required_ids, DEBUG_MODE=False, timeout=5):
 
     # page found - use it to calculate transformation matrix from frame to region of interest
     M = compute_homography(page_pts)
-    cv2.destroyAllWindows()
+    # warpPerspective redoes the per-pixel homography math on every call; M is fixed from here on, so do it
+    # once: with R=M and identity camera matrices these tables map each ROI pixel to its source pixel.
+    # Fixed-point CV_16SC2 tables are half the size of float ones and take remap's fast path.
+    eye = np.eye(3, dtype=np.float32)
+    _map1, _map2 = cv2.initUndistortRectifyMap(eye, None, M, eye, (WIDTH, HEIGHT), cv2.CV_16SC2)
+    _nearest_map1, _nearest_map2 = cv2.initUndistortRectifyMap(eye, None, M, eye, (WIDTH, HEIGHT), cv2.CV_32FC1)
+    _umaps = {}
+    if DEBUG_MODE:
+        cv2.destroyAllWindows()
     return M, page_pts
 
-def get_roi_from_frame(frame, interpolation=cv2.INTER_LINEAR):
+def frame_data(frame):
+    """
+    The frame's data as an array: a frame is passed through, already-converted data (an ndarray) as is.
+    Callers sampling several regions of one frame convert it once and pass the array around.
+    """
+    if isinstance(frame, np.ndarray):
+        return frame
+    return np.asanyarray(frame.get_data())
+
+
+def _roi_maps(interpolation):
+    """
+    The remap tables to use for an interpolation: nearest-neighbor with fixed-point tables would truncate each
+    source coordinate instead of rounding it (shifting samples by up to a pixel vs. warpPerspective), so it
+    gets the float tables
+    """
+    if interpolation == cv2.INTER_NEAREST:
+        return _nearest_map1, _nearest_map2
+    return _map1, _map2
+
+
+# get_roi_from_frame() output buffers, reused from frame to frame: (stream type, dtype, shape) -> array
+_roi_buffers = {}
+
+def get_roi_from_frame(frame, interpolation=None):
     """
     Apply the previously computed transformation matrix to the given frame
     to get the region of interest (A4 page).
-    Pass interpolation=cv2.INTER_NEAREST when warping depth data — linear
-    interpolation blends values across depth discontinuities.
+    By default Z16 depth is warped with cv2.INTER_NEAREST — linear interpolation
+    blends values across depth discontinuities (and is slower) — and anything
+    else with cv2.INTER_LINEAR. Pass interpolation=cv2.INTER_NEAREST for derived
+    depth data too, like colorized depth.
+    The result is written into a buffer that is reused by the next call for the
+    same stream, so copy it if it needs to outlive that.
     """
-    global M
-    if M is None:
+    if _map1 is None:
         raise Exception("Transformation matrix not computed yet")
 
-    np_frame = np.asanyarray(frame.get_data())
-    warped = cv2.warpPerspective(np_frame, M, (WIDTH, HEIGHT), flags=interpolation)
-    return warped
+    np_frame = frame_data(frame)
+    shape = (HEIGHT, WIDTH) + np_frame.shape[2:]
+    key = (frame.get_profile().stream_type(), np_frame.dtype, shape)
+    dst = _roi_buffers.get(key)
+    if dst is None:
+        dst = _roi_buffers[key] = np.empty(shape, dtype=np_frame.dtype)
+    if interpolation is None:
+        interpolation = cv2.INTER_NEAREST if np_frame.dtype == np.uint16 else cv2.INTER_LINEAR
+    if USE_OPENCL:
+        warped = _remap_opencl(np_frame, interpolation)
+        if warped is not None:
+            return warped
+    map1, map2 = _roi_maps(interpolation)
+    return cv2.remap(np_frame, map1, map2, interpolation, dst=dst)
+
+
+def _remap_opencl(np_frame, interpolation):
+    """
+    Remap on the GPU; returns None (and disables USE_OPENCL) if OpenCL fails
+    """
+    global USE_OPENCL, _umaps
+    try:
+        umaps = _umaps.get(interpolation)
+        if umaps is None:
+            umaps = _umaps[interpolation] = tuple(cv2.UMat(m) for m in _roi_maps(interpolation))
+        return cv2.remap(cv2.UMat(np_frame), umaps[0], umaps[1], interpolation).get()
+    except cv2.error as e:
+        log.w(f"OpenCL remap failed, falling back to CPU: {e}")
+        USE_OPENCL = False
+        return None
 
 
 SAMPLE_REGION_SIZE = 60  # Default size of the square region for depth sampling
 
 
+def get_roi_region_from_frame(frame, x, y, size=SAMPLE_REGION_SIZE, interpolation=cv2.INTER_NEAREST):
+    """
+    Same as cropping a square region of given size around (x, y) out of get_roi_from_frame(frame), but
+    only that region gets warped -- when all we need are a few small samples, warping the whole frame is
+    by far the most expensive thing we do per frame.
+    frame can also be its (unwarped) data, as returned by frame_data().
+    """
+    if _map1 is None:
+        raise Exception("Transformation matrix not computed yet")
+
+    half = size // 2
+    x_min = max(x - half, 0)
+    x_max = min(x + half + 1, WIDTH)
+    y_min = max(y - half, 0)
+    y_max = min(y + half + 1, HEIGHT)
+    np_frame = frame_data(frame)
+    map1, map2 = _roi_maps(interpolation)
+    return cv2.remap(np_frame, map1[y_min:y_max, x_min:x_max], map2[y_min:y_max, x_min:x_max], interpolation)
+
+
 def get_median_depth_from_region(image, x, y, size=SAMPLE_REGION_SIZE, min_value=600):
     """Sample a square region of given size around (x, y) and return the median depth value, filtering out values below min_value."""
     half = size // 2
@@ -134,7 +319,15 @@ def get_median_depth_from_region(image, x, y, size=SAMPLE_REGION_SIZE, min_value
     x_max = min(x + half + 1, w)
     y_min = max(y - half, 0)
     y_max = min(y + half + 1, h)
-    region = image[y_min:y_max, x_min:x_max]
+    return _median_depth(image[y_min:y_max, x_min:x_max], x, y, min_value)
+
+
+def get_median_depth_from_frame(depth_frame, x, y, size=SAMPLE_REGION_SIZE, min_value=600):
+    """Like get_median_depth_from_region() on the (nearest-neighbor) warped ROI of depth_frame, without warping all of it."""
+    return _median_depth(get_roi_region_from_frame(depth_frame, x, y, size), x, y, min_value)
+
+
+def _median_depth(region, x, y, min_value):
     filtered = region[region > min_value]
     if filtered.size == 0:
         log.w(f"No valid depth samples in region at ({x},{y})")
@@ -156,12 +349,13 @@ BG_SAMPLE_POINTS = (
 )
 
 
-def sample_bg_depth(depth_image, points=BG_SAMPLE_POINTS):
+def sample_bg_depth(depth_image, points=BG_SAMPLE_POINTS, sample=get_median_depth_from_region):
     """
     Sample median depth at each bg point and return (median_of_medians, per_region_readings).
     Empty regions are dropped. Returns (0.0, []) if every region is empty.
+    Pass a depth frame (or its frame_data()) with sample=get_median_depth_from_frame to avoid warping the whole frame.
     """
-    readings = [get_median_depth_from_region(depth_image, x, y) for x, y in points]
+    readings = [sample(depth_image, x, y) for x, y in points]
     readings = [v for v in readings if v]
     if not readings:
         return 0.0, []
@@ -184,6 +378,20 @@ def get_median_color_from_region(image, x, y, size=SAMPLE_REGION_SIZE):
     return (r, g, b)
 
 
+def get_mean_colors_from_regions(image, points, size=SAMPLE_REGION_SIZE):
+    """Sample a square region around each of the (x, y) points and return its mean color, gathering all regions
+    with a single fancy-index read. Input image is assumed to be BGR (as produced by RealSense bgr8 frames).
+    Returns an (N, 3) int array of (R, G, B) rows."""
+    half = size // 2
+    h, w = image.shape[:2]
+    points = np.asarray(points, dtype=np.intp)
+    offsets = np.arange(-half, half + 1)
+    ys = np.clip(points[:, 1, None] + offsets, 0, h - 1)[:, :, None]  # (N, size, 1)
+    xs = np.clip(points[:, 0, None] + offsets, 0, w - 1)[:, None, :]  # (N, 1, size)
+    regions = image[ys, xs].reshape(len(points), -1, 3)
+    return np.rint(regions.mean(axis=1)[:, ::-1]).astype(int)  # BGR -> RGB
+
+
 def sample_bg_color(color_image, points=BG_SAMPLE_POINTS):
     """
     Sample median color at each bg point and return (median-of-medians (R,G,B), per-region readings).
@@ -195,6 +403,16 @@ def sample_bg_color(color_image, points=BG_SAMPLE_POINTS):
     return (r, g, b), readings
 
 
+_colorizer = None
+
+def get_colorizer():
+    """Return a depth colorizer (for debug views), created on first use and shared afterwards."""
+    global _colorizer
+    if _colorizer is None:
+        _colorizer = rs.colorizer()
+    return _colorizer
+
+
 def make_depth_filter_chain():
     """
     Build the spatial + temporal filter chain mirroring realsense-viewer
@@ -231,25 +449,32 @@ TOLERANCE = {'hue': 10, 'sat': 70, 'val': 70, 'rgb': 70}
 ACHROMATIC_S = 40       # expected S below this → treat as gray/white/black
 
 
-def is_color_close(actual, expected):
-    """Compare two RGB triples: HSV for chromatic colors, per-channel RGB for achromatic."""
-    expected_h, expected_s, expected_v = (int(c) for c in
-        cv2.cvtColor(np.uint8([[[expected[2], expected[1], expected[0]]]]), cv2.COLOR_BGR2HSV)[0, 0])
+def are_colors_close(actual, expected):
+    """
+    Compare N actual RGB triples to N expected ones in one go: HSV for chromatic colors, per-channel RGB for
+    achromatic. Returns an array of N booleans.
+    """
+    actual = np.asarray(actual, dtype=np.uint8).reshape(-1, 1, 3)
+    expected = np.asarray(expected, dtype=np.uint8).reshape(-1, 1, 3)
+    actual_hsv = cv2.cvtColor(actual, cv2.COLOR_RGB2HSV).reshape(-1, 3).astype(np.int16)
+    expected_hsv = cv2.cvtColor(expected, cv2.COLOR_RGB2HSV).reshape(-1, 3).astype(np.int16)
 
     # Gray/black/white have no real hue, so compare RGB directly instead of HSV.
-    if expected_s < ACHROMATIC_S:
-        r_diff = abs(actual[0] - expected[0])
-        g_diff = abs(actual[1] - expected[1])
-        b_diff = abs(actual[2] - expected[2])
-        return max(r_diff, g_diff, b_diff) <= TOLERANCE['rgb']
-
-    actual_h, actual_s, actual_v = (int(c) for c in
-        cv2.cvtColor(np.uint8([[[actual[2], actual[1], actual[0]]]]), cv2.COLOR_BGR2HSV)[0, 0])
-    hue_diff = abs(actual_h - expected_h)
-    hue_diff = min(hue_diff, 180 - hue_diff)  # H wraps at 180
-    return (hue_diff <= TOLERANCE['hue']
-            and abs(actual_s - expected_s) <= TOLERANCE['sat']
-            and abs(actual_v - expected_v) <= TOLERANCE['val'])
+    rgb_diff = np.abs(actual.reshape(-1, 3).astype(np.int16) - expected.reshape(-1, 3)).max(axis=1)
+    rgb_close = rgb_diff <= TOLERANCE['rgb']
+
+    hue_diff = np.abs(actual_hsv[:, 0] - expected_hsv[:, 0])
+    hue_diff = np.minimum(hue_diff, 180 - hue_diff)  # H wraps at 180
+    hsv_close = ((hue_diff <= TOLERANCE['hue'])
+                 & (np.abs(actual_hsv[:, 1] - expected_hsv[:, 1]) <= TOLERANCE['sat'])
+                 & (np.abs(actual_hsv[:, 2] - expected_hsv[:, 2]) <= TOLERANCE['val']))
+
+    return np.where(expected_hsv[:, 1] < ACHROMATIC_S, rgb_close, hsv_close)
+
+
+def is_color_close(actual, expected):
+    """Compare two RGB triples: HSV for chromatic colors, per-channel RGB for achromatic."""
+    return bool(are_colors_close(actual, expected)[0])
 
 
 _snapshot_saved = set()
@@ -7,7 +7,8 @@ from pytest_check import check
 import numpy as np
 import cv2
 import logging
-from iq_helper import find_roi_location, get_roi_from_frame, is_color_close, save_failure_snapshot, WIDTH, HEIGHT
+from iq_helper import (find_roi_location, warmup, latest_frames, get_roi_from_frame,
+                       are_colors_close, get_mean_colors_from_regions, save_failure_snapshot, WIDTH, HEIGHT)
 
 log = logging.getLogger(__name__)
 
@@ -36,12 +37,16 @@ expected_colors = {
 }
 # list of color names in insertion order -> used left->right, top->bottom
 color_names = list(expected_colors.keys())
+expected_rgbs = np.array([expected_colors[name] for name in color_names], dtype=np.uint8)
 
 # we are given a 3x3 grid, we split it using 2 vertical and 2 horizontal separators
 # we also calculate the center of each grid cell for sampling from it for the test
 xs = [1.5 * WIDTH / 6.0, WIDTH / 2.0, 4.5 * WIDTH / 6.0]
 ys = [1.5 * HEIGHT / 6.0, HEIGHT / 2.0, 4.5 * HEIGHT / 6.0]
 centers = [(x, y) for y in ys for x in xs]
+centers_int = [(int(round(x)), int(round(y))) for x, y in centers]
+# (center, label, expected color as BGR) for each cell of the debug view
+debug_labels = [(center, name, expected_colors[name][::-1]) for center, name in zip(centers_int, color_names)]
 
 
 def draw_debug(frame_bgr, a4_page_bgr):
@@ -61,12 +66,9 @@ def draw_debug(frame_bgr, a4_page_bgr):
         cv2.line(a4_page_bgr, (0, int(y)), (W - 1, int(y)), (255, 255, 255), 2)
 
     # label centers with color names
-    for i, (cx, cy) in enumerate(centers):
-        cx_i, cy_i = int(round(cx)), int(round(cy))
-        lbl = color_names[i] if i < len(color_names) else str(i)
+    for (cx_i, cy_i), lbl, expected_bgr in debug_labels:
         # marker in the expected color for visual reference
-        expected_rgb = expected_colors.get(lbl, (255, 255, 255))
-        cv2.circle(a4_page_bgr, (cx_i, cy_i), 10, expected_rgb[::-1], -1)  # RGB -> BGR
+        cv2.circle(a4_page_bgr, (cx_i, cy_i), 10, expected_bgr, -1)
         cv2.putText(a4_page_bgr, lbl, (cx_i + 12, cy_i + 6),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,0,0), 2)
 
@@ -79,19 +81,18 @@ def draw_debug(frame_bgr, a4_page_bgr):
     return np.hstack([left, right])
 
 
-def run_test(ctx, resolution, fps):
+def run_test(pipeline, resolution, fps):
     log.info(f"Basic Color Image Quality Test: {resolution[0]}x{resolution[1]} @ {fps}fps")
-    color_match_count = {color: 0 for color in expected_colors.keys()}
-    color_sums = {color: np.zeros(3, dtype=int) for color in expected_colors.keys()}
-    pipeline = rs.pipeline(ctx)
+    # per color, in color_names order
+    color_match_count = np.zeros(len(color_names), dtype=int)
+    color_sums = np.zeros((len(color_names), 3), dtype=int)
     cfg = rs.config()
     cfg.enable_stream(rs.stream.color, resolution[0], resolution[1], rs.format.bgr8, fps)
     if not cfg.can_resolve(pipeline):
         log.info(f"Configuration {resolution[0]}x{resolution[1]}@{fps}fps is not supported by the device")
         return
     pipeline_profile = pipeline.start(cfg)
-    for i in range(60):  # skip initial frames
-        pipeline.wait_for_frames()
+    warmup(pipeline)  # skip initial frames
     last_frame_bgr = None
     last_roi = None
     try:
@@ -100,7 +101,7 @@ def run_test(ctx, resolution, fps):
 
         # sampling loop
         for i in range(NUM_FRAMES):
-            frames = pipeline.wait_for_frames()
+            frames = latest_frames(pipeline)
             color_frame = frames.get_color_frame()
             img_bgr = np.asanyarray(color_frame.get_data())
 
@@ -109,19 +110,15 @@ def run_test(ctx, resolution, fps):
             last_frame_bgr = img_bgr.copy()
             last_roi = color_frame_roi.copy()
 
-            # sample each grid center and compare to expected color by row-major insertion order
-            for idx, (x, y) in enumerate(centers):
-                color = color_names[idx] if idx < len(color_names) else str(idx)
-                expected_rgb = expected_colors[color]
-                x = int(round(x))
-                y = int(round(y))
-                b, g, r = (int(v) for v in color_frame_roi[y, x])  # stream is BGR, convert to RGB
-                pixel = (r, g, b)
-                color_sums[color] += pixel
-                if is_color_close(pixel, expected_rgb):
-                    color_match_count[color] += 1
-                else:
-                    log.debug(f"Frame {i} - {color} at ({x},{y}) sampled: {pixel} too far from expected {expected_rgb}")
+            # sample a region around each grid center (averaging out per-pixel noise) and compare all of them
+            # to the expected colors (row-major insertion order) at once
+            pixels = get_mean_colors_from_regions(color_frame_roi, centers_int)
+            matches = are_colors_close(pixels, expected_rgbs)
+            color_sums += pixels
+            color_match_count += matches
+            for idx in np.flatnonzero(~matches):
+                color = color_names[idx]
+                log.debug(f"Frame {i} - {color} at {centers_int[idx]} sampled: {tuple(pixels[idx].tolist())} too far from expected {expected_colors[color]}")
 
             if DEBUG_MODE:
                 dbg = draw_debug(img_bgr, color_frame_roi)
@@ -134,24 +131,26 @@ def run_test(ctx, resolution, fps):
 
         # check colors sampled correctly
         min_passes = int(NUM_FRAMES * FRAMES_PASS_THRESHOLD)
-        for name, count in color_match_count.items():
-            avg = tuple(int(v) for v in color_sums[name] // NUM_FRAMES)
+        for name, count, sums in zip(color_names, color_match_count, color_sums):
+            avg = tuple(int(v) for v in sums // NUM_FRAMES)
             log.info(f"{name.title()} passed in {count}/{NUM_FRAMES} frames  avg={avg} expected={expected_colors[name]}")
             check.is_true(count >= min_passes)
 
-        if any(c < min_passes for c in color_match_count.values()) and last_frame_bgr is not None:
+        if (color_match_count < min_passes).any() and last_frame_bgr is not None:
             save_failure_snapshot(__file__, pipeline, draw_debug(last_frame_bgr, last_roi))
 
     except Exception as e:
         save_failure_snapshot(__file__, pipeline)
         raise e
     finally:
-        cv2.destroyAllWindows()
+        if DEBUG_MODE:
+            cv2.destroyAllWindows()
         pipeline.stop()
 
 
 def test_basic_color(test_device, test_context_var):
     dev, ctx = test_device
+    pipeline = rs.pipeline(ctx)  # one pipeline, restarted with each configuration
 
     configurations = [((1280, 720), 30)]
     # on nightly we check additional arbitrary configurations
@@ -169,4 +168,4 @@ def test_basic_color(test_device, test_context_var):
         ]
 
     for resolution, fps in configurations:
-        run_test(ctx, resolution, fps)
+        run_test(pipeline, resolution, fps)
@@ -7,8 +7,8 @@ from pytest_check import check
 import cv2
 import time
 import logging
-from iq_helper import (find_roi_location, get_roi_from_frame, get_median_depth_from_region,
-                       sample_bg_depth, make_depth_filter_chain, save_failure_snapshot,
+from iq_helper import (find_roi_location, latest_frames, frame_data, get_roi_from_frame, get_median_depth_from_frame,
+                       sample_bg_depth, make_depth_filter_chain, get_colorizer, save_failure_snapshot,
                        SAMPLE_REGION_SIZE, BG_SAMPLE_POINTS, CUBE_CENTER, WIDTH, HEIGHT)
 
 log = logging.getLogger(__name__)
@@ -29,30 +29,27 @@ EXPECTED_DEPTH_DIFF = 120  # Expected difference in mm between background and cu
 
 
 def detect_roi_with_exposure(pipeline, depth_sensor, marker_ids):
-    # Set increasingly high exposure to be able to detect ArUco markers
-    exposure = 10000
-    max_exposure = 30000
-    step = 10000
-    while exposure <= max_exposure:
-        start_time = time.time()
-        depth_sensor.set_option(rs.option.exposure, exposure)
-        try:
-            find_roi_location(pipeline, marker_ids, DEBUG_MODE,
-                              timeout=15)  # extended timeout for some cases like low fps
-            log.debug(f"Page found within {time.time() - start_time}")
-            return True
-        except Exception as e:
-            log.debug(f"Got an exception: {e} within {time.time() - start_time}")
-            exposure += step
-            log.debug(f"Failed to detect markers with exposure {exposure - step}"
-                      f", trying with exposure {exposure}")
-
-    raise Exception("Page not found")
+    # Cycle through increasingly high exposures to be able to detect ArUco markers: move on to the next
+    # exposure after a few frames without them, rather than waiting out a full timeout at each one
+    exposures = (10000, 20000, 30000)
+    frames_per_exposure = 10  # enough for a new exposure to take effect, even at low fps
+    timeout = 15 * len(exposures)  # extended timeout for some cases like low fps
+
+    def next_exposure(misses):
+        if misses % frames_per_exposure == 0:
+            exposure = exposures[misses // frames_per_exposure % len(exposures)]
+            log.debug(f"Failed to detect markers in {frames_per_exposure} frames, trying with exposure {exposure}")
+            depth_sensor.set_option(rs.option.exposure, exposure)
+
+    start_time = time.time()
+    depth_sensor.set_option(rs.option.exposure, exposures[0])
+    find_roi_location(pipeline, marker_ids, DEBUG_MODE, timeout=timeout, on_miss=next_exposure)
+    log.debug(f"Page found within {time.time() - start_time}")
+    return True
 
 
 def draw_debug(depth_frame, cube_xy, depth_cube, depth_bg, measured_diff):
-    colorizer = rs.colorizer()
-    colorized_frame = colorizer.colorize(depth_frame)
+    colorized_frame = get_colorizer().colorize(depth_frame)
     # Warp the colorized depth with INTER_NEAREST too so the debug view
     # reflects the exact pixels we sampled (no smoothing across the cube edge).
     roi_img_disp = get_roi_from_frame(colorized_frame, interpolation=cv2.INTER_NEAREST)
@@ -90,14 +87,13 @@ def draw_debug(depth_frame, cube_xy, depth_cube, depth_bg, measured_diff):
     return roi_img_disp
 
 
-def run_test(dev, ctx, resolution, fps):
+def run_test(dev, pipeline, resolution, fps):
     log.info(f"Basic Depth Image Quality Test: {resolution[0]}x{resolution[1]} @ {fps}fps")
     depth_sensor = dev.first_depth_sensor()
     last_depth_frame = None
     last_depth_cube = 0
     last_depth_bg = 0
     last_measured_diff = 0
-    pipeline = rs.pipeline(ctx)
     profile = None
     try:
         cfg = rs.config()
@@ -120,23 +116,22 @@ def run_test(dev, ctx, resolution, fps):
 
         pass_count = 0
         for i in range(NUM_FRAMES):
-            frames = pipeline.wait_for_frames()
+            frames = latest_frames(pipeline)
             depth_frame = frames.get_depth_frame()
             if not depth_frame:
                 continue
 
             depth_frame = depth_filters(depth_frame)
 
-            # Warp depth with nearest-neighbor: each output pixel takes the
-            # value of the closest source pixel rather than a weighted blend
-            # of neighbors. The default INTER_LINEAR is wrong for depth — at
-            # the cube/paper boundary it averages two physically disjoint
-            # surfaces (e.g. 1050 mm cube + 1225 mm paper -> 1137 mm ghost
-            # pixels) which then contaminate the region medians.
-            depth_image = get_roi_from_frame(depth_frame, interpolation=cv2.INTER_NEAREST)
-
-            raw_cube = get_median_depth_from_region(depth_image, cube_xy[0], cube_xy[1])
-            depth_bg, bg_readings = sample_bg_depth(depth_image)
+            # Only the sampled regions get warped, with nearest-neighbor: each
+            # output pixel takes the value of the closest source pixel rather
+            # than a weighted blend of neighbors. INTER_LINEAR is wrong for
+            # depth — at the cube/paper boundary it averages two physically
+            # disjoint surfaces (e.g. 1050 mm cube + 1225 mm paper -> 1137 mm
+            # ghost pixels) which then contaminate the region medians.
+            depth_data = frame_data(depth_frame)  # once, for all the regions sampled below
+            raw_cube = get_median_depth_from_frame(depth_data, cube_xy[0], cube_xy[1])
+            depth_bg, bg_readings = sample_bg_depth(depth_data, sample=get_median_depth_from_frame)
             if not raw_cube or not depth_bg:
                 continue
             depth_cube = raw_cube
@@ -176,13 +171,15 @@ def run_test(dev, ctx, resolution, fps):
         save_failure_snapshot(__file__, pipeline)
         raise e
     finally:
-        cv2.destroyAllWindows()
+        if DEBUG_MODE:
+            cv2.destroyAllWindows()
         if profile:
             pipeline.stop()
 
 
 def test_basic_depth(test_device, test_context_var):
     dev, ctx = test_device
+    pipeline = rs.pipeline(ctx)  # one pipeline, restarted with each configuration
 
     configurations = [((1280, 720), 30)]
     # on nightly we check additional arbitrary configurations
@@ -200,4 +197,4 @@ def test_basic_depth(test_device, test_context_var):
         ]
 
     for resolution, fps in configurations:
-        run_test(dev, ctx, resolution, fps)
+        run_test(dev, pipeline, resolution, fps)
@@ -14,10 +14,10 @@ from pytest_check import check
 import numpy as np
 import cv2
 import logging
-from iq_helper import (find_roi_location, get_roi_from_frame, is_color_close,
-                       get_median_depth_from_region, sample_bg_depth,
+from iq_helper import (find_roi_location, warmup, latest_frames, frame_data, get_roi_from_frame, is_color_close,
+                       get_median_depth_from_frame, sample_bg_depth,
                        get_median_color_from_region, sample_bg_color,
-                       make_depth_filter_chain, save_failure_snapshot,
+                       make_depth_filter_chain, get_colorizer, save_failure_snapshot,
                        SAMPLE_REGION_SIZE, BG_SAMPLE_POINTS, CUBE_CENTER, WIDTH, HEIGHT)
 
 log = logging.getLogger(__name__)
@@ -50,9 +50,8 @@ def draw_debug(depth_frame, color_roi, depth_cube, depth_bg, measured_diff):
     """
     Simple debug view: depth+color overlay with sampling points and depth values
     """
-    colorizer = rs.colorizer()
     # INTER_NEAREST so the debug view reflects the exact pixels we sampled.
-    depth_image = get_roi_from_frame(colorizer.colorize(depth_frame), interpolation=cv2.INTER_NEAREST)
+    depth_image = get_roi_from_frame(get_colorizer().colorize(depth_frame), interpolation=cv2.INTER_NEAREST)
     overlay = cv2.addWeighted(depth_image, 0.7, color_roi, 0.3, 0)
 
     half = SAMPLE_REGION_SIZE // 2
@@ -89,11 +88,10 @@ def draw_debug(depth_frame, color_roi, depth_cube, depth_bg, measured_diff):
     return cv2.resize(overlay, (width, height))
 
 
-def run_test(dev, ctx, depth_resolution, depth_fps, color_resolution, color_fps):
+def run_test(dev, pipeline, depth_resolution, depth_fps, color_resolution, color_fps):
     log.info(f"Texture Mapping Test: "
              f"Depth: {depth_resolution[0]}x{depth_resolution[1]} @ {depth_fps}fps | "
              f"Color: {color_resolution[0]}x{color_resolution[1]} @ {color_fps}fps")
-    pipeline = None
     pipeline_profile = None
     last_color_roi = None
     last_depth_frame = None
@@ -101,7 +99,6 @@ def run_test(dev, ctx, depth_resolution, depth_fps, color_resolution, color_fps)
     last_depth_bg = 0
     last_measured_diff = 0
     try:
-        pipeline = rs.pipeline(ctx)
         cfg = rs.config()
         cfg.enable_stream(rs.stream.depth, depth_resolution[0], depth_resolution[1], rs.format.z16, depth_fps)
         cfg.enable_stream(rs.stream.color, color_resolution[0], color_resolution[1], rs.format.bgr8, color_fps)
@@ -125,8 +122,7 @@ def run_test(dev, ctx, depth_resolution, depth_fps, color_resolution, color_fps)
             check.fail("Extrinsics between depth and color streams are all zeros, aligned stream will show blank frames, failing test")
             return
 
-        for i in range(60):  # skip initial frames
-            pipeline.wait_for_frames()
+        warmup(pipeline)  # skip initial frames
 
         align = rs.align(rs.stream.color)
 
@@ -139,7 +135,7 @@ def run_test(dev, ctx, depth_resolution, depth_fps, color_resolution, color_fps)
         find_roi_location(pipeline, (4, 5, 6, 7), DEBUG_MODE)  # markers in the lab are 4,5,6,7
 
         for i in range(NUM_FRAMES):
-            frames = pipeline.wait_for_frames()
+            frames = latest_frames(pipeline)
             aligned_frames = align.process(frames)
 
             depth_frame = aligned_frames.get_depth_frame()
@@ -157,9 +153,6 @@ def run_test(dev, ctx, depth_resolution, depth_fps, color_resolution, color_fps)
             depth_frame = depth_filters(depth_frame)
 
             color_frame_roi = get_roi_from_frame(color_frame)
-            # Nearest-neighbor on depth — linear interpolation blends values
-            # across cube/paper discontinuities.
-            depth_frame_roi = get_roi_from_frame(depth_frame, interpolation=cv2.INTER_NEAREST)
 
             last_color_roi = color_frame_roi.copy()
             last_depth_frame = depth_frame
@@ -184,8 +177,11 @@ def run_test(dev, ctx, depth_resolution, depth_fps, color_resolution, color_fps)
 
             # Cube depth: single region median at center.
             # Bg depth: median across BG_SAMPLE_POINTS.
-            raw_cube = get_median_depth_from_region(depth_frame_roi, cube_x, cube_y)
-            raw_bg, bg_readings = sample_bg_depth(depth_frame_roi, BG_SAMPLE_POINTS)
+            # Only these regions of depth get warped, nearest-neighbor — linear
+            # interpolation blends values across cube/paper discontinuities.
+            depth_data = frame_data(depth_frame)  # once, for all the regions sampled below
+            raw_cube = get_median_depth_from_frame(depth_data, cube_x, cube_y)
+            raw_bg, bg_readings = sample_bg_depth(depth_data, BG_SAMPLE_POINTS, sample=get_median_depth_from_frame)
 
             if not raw_bg or not raw_cube:
                 continue
@@ -236,13 +232,15 @@ def run_test(dev, ctx, depth_resolution, depth_fps, color_resolution, color_fps)
         log.exception("Unexpected exception")
         check.fail(f"Unexpected exception: {e}")
     finally:
-        cv2.destroyAllWindows()
+        if DEBUG_MODE:
+            cv2.destroyAllWindows()
         if pipeline_profile:
             pipeline.stop()
 
 
 def test_texture_mapping(test_device, test_context_var):
     dev, ctx = test_device
+    pipeline = rs.pipeline(ctx)  # one pipeline, restarted with each configuration
 
     configurations = [((1280, 720), 30)]
     # on nightly we check additional arbitrary configurations
@@ -266,5 +264,5 @@ def test_texture_mapping(test_device, test_context_var):
                 if depth_resolution != color_resolution or depth_fps != color_fps:
                     continue
 
-            run_test(dev, ctx, depth_resolution, depth_fps, color_resolution, color_fps)
+            run_test(dev, pipeline, depth_resolution, depth_fps, color_resolution, color_fps)
 
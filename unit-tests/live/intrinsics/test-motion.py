@@ -19,12 +19,16 @@ test.start('Check intrinsics in motion sensor:')
 test.check(motion_sensor)
 
 if motion_sensor:
-    if rs.stream.motion in [p.stream_type() for p in motion_sensor.profiles]: # D555 works with combined motion instead of accel and gyro
-        motion_profile = next(p for p in motion_sensor.profiles if p.stream_type() == rs.stream.motion)
-        motion_profiles = [motion_profile]
+    # first profile of each stream type, from a single pass over the sensor's profiles
+    first_profiles = {}
+    for p in motion_sensor.profiles:
+        first_profiles.setdefault(p.stream_type(), p)
+
+    if rs.stream.motion in first_profiles: # D555 works with combined motion instead of accel and gyro
+        motion_profiles = [first_profiles[rs.stream.motion]]
     else:
-        motion_profile_accel = next(p for p in motion_sensor.profiles if p.stream_type() == rs.stream.accel)
-        motion_profile_gyro = next(p for p in motion_sensor.profiles if p.stream_type() == rs.stream.gyro)
+        motion_profile_accel = first_profiles.get(rs.stream.accel)
+        motion_profile_gyro = first_profiles.get(rs.stream.gyro)
         test.check(motion_profile_accel and motion_profile_gyro)
         motion_profiles = [motion_profile_accel, motion_profile_gyro]
 
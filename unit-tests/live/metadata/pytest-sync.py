@@ -3,6 +3,7 @@
 
 import pytest
 import pyrealsense2 as rs
+import numpy as np
 from pytest_check import check
 import time
 import logging
@@ -19,6 +20,15 @@ pytestmark = [
 TS_TOLERANCE_MS = 1.5  # Tolerance for timestamp differences in ms
 TS_TOLERANCE_MICROSEC = TS_TOLERANCE_MS * 1000
 SKIP_FRAMES_AFTER_DROP = 10  # Frames to skip after detecting drops
+FRAMES_TO_TEST = 100
+COLD_STABILIZATION_SEC = 5  # First start: longer stabilization to prevent initial frame drop issues
+WARM_STABILIZATION_SEC = 1  # Later configurations, once the device has already streamed
+
+FRAME_COUNTER = rs.frame_metadata_value.frame_counter
+FRAME_TIMESTAMP = rs.frame_metadata_value.frame_timestamp
+STREAM_NAMES = ('depth', 'ir1', 'ir2', 'color')
+NO_COUNTERS = (None,) * len(STREAM_NAMES)
+COMPARED_LABELS = ('IR1', 'IR2', 'Color')  # Streams compared against depth, in STREAM_NAMES order
 
 CONFIGURATIONS = [
     ((640, 480), 15),
@@ -30,32 +40,43 @@ CONFIGURATIONS = [
 ]
 
 
-def detect_frame_drops(frames_dict, prev_frame_counters):
+def detect_frame_drops(frames, prev_frame_counters, has_counter):
     """Detect frame drops using hardware frame counters"""
     frame_drop_detected = False
-    current_frame_counters = {}
+    current_frame_counters = tuple(f.get_frame_metadata(FRAME_COUNTER) if supported else None
+                                   for f, supported in zip(frames, has_counter))
 
-    for stream_name, frame in frames_dict.items():
-        if not frame.supports_frame_metadata(rs.frame_metadata_value.frame_counter):
+    for stream_name, current_counter, prev_counter in zip(STREAM_NAMES, current_frame_counters, prev_frame_counters):
+        if current_counter is None or prev_counter is None or current_counter == prev_counter + 1:
             continue
-
-        current_counter = frame.get_frame_metadata(rs.frame_metadata_value.frame_counter)
-        current_frame_counters[stream_name] = current_counter
-
-        prev_counter = prev_frame_counters[stream_name]
-        if prev_counter is not None and current_counter != prev_counter + 1:
-            dropped_frames = current_counter - prev_counter - 1
-            if dropped_frames > 0:
-                log.warning(f"Frame drop detected on {stream_name}: {dropped_frames} frames dropped")
-            else:
-                log.warning(f"Frame drop detected on {stream_name}: current {current_counter}, previous {prev_counter}")
-            frame_drop_detected = True
+        dropped_frames = current_counter - prev_counter - 1
+        if dropped_frames > 0:
+            log.warning(f"Frame drop detected on {stream_name}: {dropped_frames} frames dropped")
+        else:
+            log.warning(f"Frame drop detected on {stream_name}: current {current_counter}, previous {prev_counter}")
+        frame_drop_detected = True
 
     return frame_drop_detected, current_frame_counters
 
 
-def run_test(device, ctx, resolution, fps):
-    """Run timestamp synchronization test for a specific resolution and FPS"""
+def check_timestamps(timestamps, tolerance, description, unit):
+    """
+    Check a (frames x streams) timestamp table: every stream must be within tolerance of depth.
+    The table is screened in one pass; only frames out of tolerance are checked (and reported) individually.
+    """
+    deviations = np.abs(timestamps[:, 1:] - timestamps[:, :1])
+    for row in np.flatnonzero((deviations > tolerance).any(axis=1)):
+        depth_ts = timestamps[row, 0]
+        for label, ts, diff in zip(COMPARED_LABELS, timestamps[row, 1:], deviations[row]):
+            check.almost_equal(depth_ts, ts, abs=tolerance,
+                msg=f"Depth-{label} {description} diff {diff:.3f}{unit} exceeds tolerance {tolerance}{unit}")
+
+
+def run_test(device, ctx, resolution, fps, stabilization_sec):
+    """
+    Run timestamp synchronization test for a specific resolution and FPS
+    Returns False if the configuration is not supported (and nothing was streamed)
+    """
     pipeline = rs.pipeline(ctx)
     cfg = rs.config()
     cfg.enable_stream(rs.stream.depth, resolution[0], resolution[1], rs.format.z16, fps)
@@ -64,7 +85,7 @@ def run_test(device, ctx, resolution, fps):
     cfg.enable_stream(rs.stream.color, resolution[0], resolution[1], rs.format.yuyv, fps)
     if not cfg.can_resolve(pipeline):
         log.info(f"Configuration {resolution[0]}x{resolution[1]} @ {fps}fps is not supported by the device")
-        return
+        return False
 
     depth_sensor = device.first_depth_sensor()
     color_sensor = device.first_color_sensor()
@@ -77,35 +98,44 @@ def run_test(device, ctx, resolution, fps):
             pytest.fail(f"Sensor {sensor.name} does not support global time option")
 
     pipeline.start(cfg)
-    time.sleep(5)  # Longer stabilization to prevent initial frame drop issues
+    time.sleep(stabilization_sec)
 
-    prev_frame_counters = {'depth': None, 'ir1': None, 'ir2': None, 'color': None}
+    prev_frame_counters = NO_COUNTERS
     frames_to_skip = 0
     consecutive_drops = 0
     unskipped_frames = 0
+    has_counter = has_timestamp = None  # metadata support, resolved on the first complete frameset
+    # Timestamps of the frames under test, checked together once streaming is done
+    global_ts = np.empty((FRAMES_TO_TEST, len(STREAM_NAMES)))
+    frame_ts = np.empty((FRAMES_TO_TEST, len(STREAM_NAMES)))
+    n_tested = 0
 
     try:
-        while unskipped_frames < 100:
+        while unskipped_frames < FRAMES_TO_TEST:
             frames = pipeline.wait_for_frames()
             depth_frame = frames.get_depth_frame()
             ir1_frame = frames.get_infrared_frame(1)
             ir2_frame = frames.get_infrared_frame(2)
             color_frame = frames.get_color_frame()
 
-            if not all([depth_frame, ir1_frame, ir2_frame, color_frame]):
+            if not (depth_frame and ir1_frame and ir2_frame and color_frame):
                 log.error("One or more frames are missing")
                 continue
+            frame_tuple = (depth_frame, ir1_frame, ir2_frame, color_frame)
+
+            if has_counter is None:
+                has_counter = tuple(f.supports_frame_metadata(FRAME_COUNTER) for f in frame_tuple)
+                has_timestamp = all(f.supports_frame_metadata(FRAME_TIMESTAMP) for f in frame_tuple)
 
             # Skip frames during recovery
             if frames_to_skip > 0:
                 frames_to_skip -= 1
                 if frames_to_skip == 0:
-                    prev_frame_counters = {'depth': None, 'ir1': None, 'ir2': None, 'color': None}
+                    prev_frame_counters = NO_COUNTERS
                 continue
 
             # Check for frame drops
-            frames_dict = {'depth': depth_frame, 'ir1': ir1_frame, 'ir2': ir2_frame, 'color': color_frame}
-            frame_drop_detected, current_frame_counters = detect_frame_drops(frames_dict, prev_frame_counters)
+            frame_drop_detected, current_frame_counters = detect_frame_drops(frame_tuple, prev_frame_counters, has_counter)
             unskipped_frames += 1
 
             # Handle frame drops
@@ -122,41 +152,35 @@ def run_test(device, ctx, resolution, fps):
             prev_frame_counters = current_frame_counters
             consecutive_drops = 0
 
-            # Test timestamp synchronization
-            log.debug(f"Global TS - Depth:{depth_frame.timestamp}, IR1:{ir1_frame.timestamp}, "
-                       f"IR2:{ir2_frame.timestamp}, Color:{color_frame.timestamp}")
-
-            check.almost_equal(depth_frame.timestamp, ir1_frame.timestamp, abs=TS_TOLERANCE_MS,
-                msg=f"Depth-IR1 timestamp diff {abs(depth_frame.timestamp - ir1_frame.timestamp):.3f}ms exceeds tolerance {TS_TOLERANCE_MS}ms")
-            check.almost_equal(depth_frame.timestamp, ir2_frame.timestamp, abs=TS_TOLERANCE_MS,
-                msg=f"Depth-IR2 timestamp diff {abs(depth_frame.timestamp - ir2_frame.timestamp):.3f}ms exceeds tolerance {TS_TOLERANCE_MS}ms")
-            check.almost_equal(depth_frame.timestamp, color_frame.timestamp, abs=TS_TOLERANCE_MS,
-                msg=f"Depth-Color timestamp diff {abs(depth_frame.timestamp - color_frame.timestamp):.3f}ms exceeds tolerance {TS_TOLERANCE_MS}ms")
-
-            # Test frame metadata timestamps if supported
-            if all(f.supports_frame_metadata(rs.frame_metadata_value.frame_timestamp) for f in frames_dict.values()):
-                frame_timestamps = {name: f.get_frame_metadata(rs.frame_metadata_value.frame_timestamp)
-                                    for name, f in frames_dict.items()}
-
-                log.debug(f"Frame TS - Depth:{frame_timestamps['depth']}, IR1:{frame_timestamps['ir1']}, "
-                           f"IR2:{frame_timestamps['ir2']}, Color:{frame_timestamps['color']}")
-
-                check.almost_equal(frame_timestamps['depth'], frame_timestamps['ir1'], abs=TS_TOLERANCE_MICROSEC,
-                    msg=f"Depth-IR1 frame TS diff exceeds tolerance {TS_TOLERANCE_MICROSEC}us")
-                check.almost_equal(frame_timestamps['depth'], frame_timestamps['ir2'], abs=TS_TOLERANCE_MICROSEC,
-                    msg=f"Depth-IR2 frame TS diff exceeds tolerance {TS_TOLERANCE_MICROSEC}us")
-                check.almost_equal(frame_timestamps['depth'], frame_timestamps['color'], abs=TS_TOLERANCE_MICROSEC,
-                    msg=f"Depth-Color frame TS diff exceeds tolerance {TS_TOLERANCE_MICROSEC}us")
+            # Record timestamps for the synchronization checks
+            row = global_ts[n_tested]
+            row[:] = [f.timestamp for f in frame_tuple]
+            log.debug("Global TS - Depth:%s, IR1:%s, IR2:%s, Color:%s", *row)
+
+            # Frame metadata timestamps are tested only if supported
+            if has_timestamp:
+                row = frame_ts[n_tested]
+                row[:] = [f.get_frame_metadata(FRAME_TIMESTAMP) for f in frame_tuple]
+                log.debug("Frame TS - Depth:%s, IR1:%s, IR2:%s, Color:%s", *row)
+            n_tested += 1
     finally:
         pipeline.stop()
 
+    check_timestamps(global_ts[:n_tested], TS_TOLERANCE_MS, "timestamp", "ms")
+    if has_timestamp:
+        check_timestamps(frame_ts[:n_tested], TS_TOLERANCE_MICROSEC, "frame TS", "us")
+    return True
+
 
 def test_synchronized_frames(test_device):
     """Verify that timestamps of depth, infrared and color frames are consistent across configurations"""
     device, ctx = test_device
 
     time.sleep(1)  # let device settle after hub power-cycle, before first pipeline.start
+    warm = False
     for resolution, fps in CONFIGURATIONS:
         log.info(f"Timestamp Synchronization Test {resolution[0]}x{resolution[1]} @ {fps}fps")
-        run_test(device, ctx, resolution, fps)
+        streamed = run_test(device, ctx, resolution, fps,
+                            WARM_STABILIZATION_SEC if warm else COLD_STABILIZATION_SEC)
+        warm = warm or streamed
         time.sleep(2)  # let hardware settle between configurations after pipeline.stop
@@ -16,7 +16,9 @@ import pyrealsense2 as rs
 from pytest_check import check
 from rspy.pytest.device_helpers import is_jetson_platform
 import time
+import numpy as np
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import logging
 log = logging.getLogger(__name__)
 
@@ -30,6 +32,15 @@ pytestmark = [
 STREAM_DURATION_SEC = 10
 MAX_FRAME_DROP_PERCENTAGE = 5.0
 STABILIZATION_TIME_SEC = 3
+QUEUE_CAPACITY = 64  # Frames buffered per sensor between librealsense and the draining loop
+FRAME_COUNTER = rs.frame_metadata_value.frame_counter
+
+# Streams to run together: (stream type, stream index or -1 for any, formats in order of preference)
+MULTI_STREAMS = [
+    (rs.stream.depth, -1, [rs.format.z16]),
+    (rs.stream.color, -1, [rs.format.rgb8, rs.format.bgr8, rs.format.rgba8, rs.format.bgra8, rs.format.yuyv]),
+    (rs.stream.infrared, 1, [rs.format.y8]),
+]
 
 # Target resolutions to try in order of preference
 TARGET_RESOLUTIONS = [
@@ -38,19 +49,29 @@ TARGET_RESOLUTIONS = [
 ]
 
 
-def find_common_profile(devs, stream_type, stream_format, target_resolutions):
-    """Return (width, height, fps) available on all devices, or None."""
+def describe_device(dev):
+    """Return {'sn', 'name'} for a device, querying each camera_info field once."""
+    name = dev.get_info(rs.camera_info.name) if dev.supports(rs.camera_info.name) else "Unknown"
+    return {'sn': dev.get_info(rs.camera_info.serial_number), 'name': name}
+
+
+def get_device_profiles(dev):
+    """Return the set of (stream_type, format, width, height, fps) profiles a device offers for MULTI_STREAMS."""
+    wanted = {(stream_type, fmt) for stream_type, _, formats in MULTI_STREAMS for fmt in formats}
+    profiles = set()
+    for sensor in dev.query_sensors():
+        for p in sensor.get_stream_profiles():
+            if (p.stream_type(), p.format()) not in wanted or not p.is_video_stream_profile():
+                continue
+            vp = p.as_video_stream_profile()
+            profiles.add((vp.stream_type(), vp.format(), vp.width(), vp.height(), vp.fps()))
+    return profiles
+
+
+def find_common_profile(common_profiles, stream_type, stream_format, target_resolutions):
+    """Return the first (width, height, fps) in target_resolutions found in common_profiles, or None."""
     for w, h, fps in target_resolutions:
-        if all(
-            any(p.stream_type() == stream_type and p.format() == stream_format
-                and p.as_video_stream_profile().width() == w
-                and p.as_video_stream_profile().height() == h
-                and p.fps() == fps
-                for sensor in dev.query_sensors()
-                for p in sensor.get_stream_profiles()
-                if p.is_video_stream_profile())
-            for dev in devs
-        ):
+        if (stream_type, stream_format, w, h, fps) in common_profiles:
             return w, h, fps
     return None
 
@@ -60,46 +81,42 @@ def get_common_multi_stream_config(*devs):
     Find a multi-stream configuration that works on all provided devices.
     Returns a list of (stream_type, stream_index, width, height, format, fps) tuples.
     """
-    stream_configs = []
+    common_profiles = set.intersection(*(get_device_profiles(dev) for dev in devs))
+    if not common_profiles:
+        log.debug("  No video profiles are shared by all devices")
+        return []
 
-    res = find_common_profile(devs, rs.stream.depth, rs.format.z16, TARGET_RESOLUTIONS)
-    if res:
-        w, h, fps = res
-        log.debug(f"  Added Depth stream: {w}x{h} @ {fps}fps")
-        stream_configs.append((rs.stream.depth, -1, w, h, rs.format.z16, fps))
-
-    for color_format in [rs.format.rgb8, rs.format.bgr8, rs.format.rgba8, rs.format.bgra8, rs.format.yuyv]:
-        res = find_common_profile(devs, rs.stream.color, color_format, TARGET_RESOLUTIONS)
-        if res:
-            w, h, fps = res
-            log.debug(f"  Added Color stream: {w}x{h} @ {fps}fps {color_format}")
-            stream_configs.append((rs.stream.color, -1, w, h, color_format, fps))
-            break
-
-    res = find_common_profile(devs, rs.stream.infrared, rs.format.y8, TARGET_RESOLUTIONS)
-    if res:
-        w, h, fps = res
-        log.debug(f"  Added Infrared stream (index 1): {w}x{h} @ {fps}fps")
-        stream_configs.append((rs.stream.infrared, 1, w, h, rs.format.y8, fps))
+    stream_configs = []
+    for stream_type, stream_index, formats in MULTI_STREAMS:
+        for stream_format in formats:
+            res = find_common_profile(common_profiles, stream_type, stream_format, TARGET_RESOLUTIONS)
+            if res:
+                w, h, fps = res
+                log.debug(f"  Added {stream_type} stream (index {stream_index}): {w}x{h} @ {fps}fps {stream_format}")
+                stream_configs.append((stream_type, stream_index, w, h, stream_format, fps))
+                break
 
     return stream_configs
 
 
-def analyze_device_drops(frame_counters, stream_frame_counts, device_name):
+def analyze_device_drops(frame_counters, counter_lengths, stream_frame_counts, device_name):
     """Analyze frame drops for a single device across all streams."""
     total_expected = 0
     total_received = 0
     per_stream_stats = {}
 
     for stream_type, counters in frame_counters.items():
-        if len(counters) < 2:
-            log.warning(f"  {device_name} {stream_type}: insufficient frames ({len(counters)})")
+        received = counter_lengths[stream_type]
+        if received < 2:
+            log.warning(f"  {device_name} {stream_type}: insufficient frames ({received})")
             continue
 
-        counter_range = counters[-1] - counters[0]
-        expected = counter_range + 1
-        received = len(counters)
+        counters = counters[:received]
+        expected = int(counters[-1] - counters[0]) + 1
         dropped = expected - received
+        gaps = np.flatnonzero(np.diff(counters) != 1)
+        if gaps.size:
+            log.debug(f"  {device_name} {stream_type}: counter gaps after {counters[gaps].tolist()}")
 
         total_expected += expected
         total_received += received
@@ -125,12 +142,12 @@ def analyze_device_drops(frame_counters, stream_frame_counts, device_name):
     return overall_drop_pct, per_stream_stats
 
 
-def aggregate_results(all_frame_counters, all_frames_received, all_stream_frame_counts,
+def aggregate_results(all_frame_counters, all_counter_lengths, all_frames_received, all_stream_frame_counts,
                       device_info, actual_duration):
     """Aggregate and analyze results from all devices."""
     log.info(f"Streaming completed after {actual_duration:.2f} seconds")
-    for i, info in enumerate(device_info):
-        log.info(f"Device {i+1} ({info['name']}): {all_frames_received[i]} total frames")
+    for i, (info, frames_received) in enumerate(zip(device_info, all_frames_received), 1):
+        log.info(f"Device {i} ({info['name']}): {frames_received} total frames")
 
     for i, (info, stream_counts) in enumerate(zip(device_info, all_stream_frame_counts)):
         log.debug(f"Device {i+1} frame counts by stream:")
@@ -140,16 +157,16 @@ def aggregate_results(all_frame_counters, all_frames_received, all_stream_frame_
     drop_percentages = []
     all_stats = []
 
-    for i, (frame_counters, stream_counts, info) in enumerate(
-            zip(all_frame_counters, all_stream_frame_counts, device_info)):
+    for i, (frame_counters, counter_lengths, stream_counts, info, frames_received) in enumerate(
+            zip(all_frame_counters, all_counter_lengths, all_stream_frame_counts, device_info, all_frames_received)):
         drop_pct, stream_stats = analyze_device_drops(
-            frame_counters, stream_counts, f"Dev{i+1}({info['sn']})")
+            frame_counters, counter_lengths, stream_counts, f"Dev{i+1}({info['sn']})")
         drop_percentages.append(drop_pct)
 
         dev_stats = {
             'name': info['name'],
             'sn': info['sn'],
-            'total_frames': all_frames_received[i],
+            'total_frames': frames_received,
             'drop_pct': drop_pct,
             'streams': stream_stats
         }
@@ -165,98 +182,132 @@ def aggregate_results(all_frame_counters, all_frames_received, all_stream_frame_
     return success, drop_percentages, stats
 
 
-def stream_multi_and_check_frames(devs, stream_configs, duration_sec=STREAM_DURATION_SEC):
+def start_sensors(sensor_starts, active_sensors):
+    """Open and start one device's sensors in order, recording each in active_sensors once opened."""
+    for sensor, profiles, queue in sensor_starts:
+        sensor.open(profiles)
+        active_sensors.append(sensor)
+        sensor.start(queue)
+
+
+def stop_sensors(sensors):
+    """Stop and close one device's sensors, logging (not raising) any errors."""
+    for s in sensors:
+        try:
+            s.stop()
+        except Exception as e:
+            log.debug(f"Stop error: {e}")
+        try:
+            s.close()
+        except Exception as e:
+            log.debug(f"Close error: {e}")
+
+
+def stream_multi_and_check_frames(devs, device_info, stream_configs, duration_sec=STREAM_DURATION_SEC):
     """Stream multiple stream types from all devices simultaneously and check for frame drops."""
-    device_info = []
     all_frame_counters = []
+    all_counter_lengths = []
     all_stream_frame_counts = []
-    active_sensors = []
-
-    counting = [False]  # Mutable container for closure access
-
-    def make_callback(frame_counters, frame_counts):
-        def callback(frame):
-            if not counting[0]:
-                return
-            st = frame.get_profile().stream_type()
-            frame_counts[st] += 1
-            if frame.supports_frame_metadata(rs.frame_metadata_value.frame_counter):
-                frame_counters[st].append(frame.get_frame_metadata(rs.frame_metadata_value.frame_counter))
-        return callback
+    device_starts = []  # per device: (sensor, profiles, queue) to open and start
+    active_sensors = []  # per device: sensors opened so far
+
+    # Sensors push into native frame queues, so their threads never wait on the GIL; we drain them here
+    sensor_queues = []  # (queue, frame_counters, counter_lengths, frame_counts)
+    has_counter = {}  # frame-counter metadata support per stream type, resolved on its first frame
+
+    # Frame counters go into preallocated arrays, with headroom over the nominal frame count
+    capacity = int(duration_sec * max(cfg[5] for cfg in stream_configs) * 1.5)
+    stream_types = {cfg[0] for cfg in stream_configs}
+
+    def drain_queues(record):
+        for queue, frame_counters, counter_lengths, frame_counts in sensor_queues:
+            frame = queue.poll_for_frame()
+            while frame:
+                if record:
+                    st = frame.get_profile().stream_type()
+                    frame_counts[st] += 1
+                    if st not in has_counter:
+                        has_counter[st] = frame.supports_frame_metadata(FRAME_COUNTER)
+                    n = counter_lengths[st]
+                    if has_counter[st] and n < capacity:
+                        frame_counters[st][n] = frame.get_frame_metadata(FRAME_COUNTER)
+                        counter_lengths[st] = n + 1
+                frame = queue.poll_for_frame()
+
+    def drain_for(seconds, record):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            drain_queues(record)
+            time.sleep(0.005)
 
     try:
-        for dev in devs:
-            sn = dev.get_info(rs.camera_info.serial_number)
-            name = dev.get_info(rs.camera_info.name) if dev.supports(rs.camera_info.name) else "Unknown"
-            device_info.append({'sn': sn, 'name': name})
-
-            frame_counters = defaultdict(list)
+        for dev, info in zip(devs, device_info):
+            frame_counters = {st: np.empty(capacity, np.int64) for st in stream_types}
+            counter_lengths = dict.fromkeys(stream_types, 0)
             frame_counts = defaultdict(int)
             all_frame_counters.append(frame_counters)
+            all_counter_lengths.append(counter_lengths)
             all_stream_frame_counts.append(frame_counts)
-            cb = make_callback(frame_counters, frame_counts)
 
+            # Index the device's video profiles once; a stream_index of -1 matches any index
             sensors = dev.query_sensors()
-            profiles_by_idx = defaultdict(list)
-            for stream_type, stream_index, w, h, fmt, fps in stream_configs:
-                found = False
-                for idx, sensor in enumerate(sensors):
-                    for p in sensor.get_stream_profiles():
-                        if not p.is_video_stream_profile():
-                            continue
-                        vp = p.as_video_stream_profile()
-                        idx_match = stream_index < 0 or vp.stream_index() == stream_index
-                        if (vp.stream_type() == stream_type and vp.format() == fmt
-                                and vp.width() == w and vp.height() == h
-                                and vp.fps() == fps and idx_match):
-                            profiles_by_idx[idx].append(p)
-                            found = True
-                            break
-                    if found:
-                        break
-                if not found:
-                    pytest.fail(f"No matching profile for {stream_type} on {name}")
+            profile_lookup = {}
+            for idx, sensor in enumerate(sensors):
+                for p in sensor.get_stream_profiles():
+                    if not p.is_video_stream_profile():
+                        continue
+                    vp = p.as_video_stream_profile()
+                    key = (vp.stream_type(), vp.width(), vp.height(), vp.format(), vp.fps())
+                    profile_lookup.setdefault((key[0], vp.stream_index()) + key[1:], (idx, p))
+                    profile_lookup.setdefault((key[0], -1) + key[1:], (idx, p))
 
+            profiles_by_idx = defaultdict(list)
+            for stream_config in stream_configs:
+                match = profile_lookup.get(stream_config)
+                if match is None:
+                    pytest.fail(f"No matching profile for {stream_config[0]} on {info['name']}")
+                idx, p = match
+                profiles_by_idx[idx].append(p)
+
+            sensor_starts = []
             for idx, profiles in profiles_by_idx.items():
-                sensor = sensors[idx]
-                sensor.open(profiles)
-                active_sensors.append(sensor)
-                sensor.start(cb)
+                queue = rs.frame_queue(QUEUE_CAPACITY, keep_frames=True)
+                sensor_queues.append((queue, frame_counters, counter_lengths, frame_counts))
+                sensor_starts.append((sensors[idx], profiles, queue))
+            device_starts.append(sensor_starts)
+            active_sensors.append([])
+
+        # open/start release the GIL, so devices come up concurrently rather than one USB handshake at a time
+        with ThreadPoolExecutor(max_workers=len(device_starts)) as executor:
+            list(executor.map(start_sensors, device_starts, active_sensors))
 
         log.info(f"Stabilizing for {STABILIZATION_TIME_SEC} seconds...")
-        time.sleep(STABILIZATION_TIME_SEC)
+        drain_for(STABILIZATION_TIME_SEC, record=False)
 
-        counting[0] = True
         log.info(f"Streaming for {duration_sec} seconds...")
-        start_time = time.time()
-        time.sleep(duration_sec)
-        actual_duration = time.time() - start_time
-        counting[0] = False
+        start_time = time.monotonic()
+        drain_for(duration_sec, record=True)
+        actual_duration = time.monotonic() - start_time
+        drain_queues(record=True)  # frames that arrived within the window but were not consumed yet
     finally:
-        for s in active_sensors:
-            try:
-                s.stop()
-            except Exception as e:
-                log.debug(f"Stop error: {e}")
-            try:
-                s.close()
-            except Exception as e:
-                log.debug(f"Close error: {e}")
+        if active_sensors:
+            with ThreadPoolExecutor(max_workers=len(active_sensors)) as executor:
+                list(executor.map(stop_sensors, active_sensors))
 
     all_frames = [sum(cnt.values()) for cnt in all_stream_frame_counts]
-    return aggregate_results(all_frame_counters, all_frames, all_stream_frame_counts, device_info, actual_duration)
+    return aggregate_results(all_frame_counters, all_counter_lengths, all_frames, all_stream_frame_counts,
+                             device_info, actual_duration)
 
 
 def test_multi_stream_operation(test_devices):
     """Simultaneous multi-stream operation (depth + color + IR) on multiple devices"""
     device_list, ctx = test_devices
+    device_info = [describe_device(dev) for dev in device_list]
 
     log.info("=" * 80)
     log.info(f"Testing multi-stream operation on {len(device_list)} devices:")
-    for i, dev in enumerate(device_list, 1):
-        sn = dev.get_info(rs.camera_info.serial_number)
-        name = dev.get_info(rs.camera_info.name) if dev.supports(rs.camera_info.name) else "Unknown"
-        log.info(f"  Device {i}: {name} (SN: {sn})")
+    for i, info in enumerate(device_info, 1):
+        log.info(f"  Device {i}: {info['name']} (SN: {info['sn']})")
     log.info("=" * 80)
 
     # Get common multi-stream configuration
@@ -272,7 +323,7 @@ def test_multi_stream_operation(test_devices):
     log.info(f"Will stream all of them simultaneously from all {len(device_list)} devices")
 
     success, drop_percentages, stats = stream_multi_and_check_frames(
-        device_list, stream_configs=stream_configs
+        device_list, device_info, stream_configs=stream_configs
     )
 
     # Check for analysis errors
@@ -280,22 +331,18 @@ def test_multi_stream_operation(test_devices):
         log.error("FAIL - No device statistics collected")
         assert False, "Should collect statistics from all devices"
     else:
-        # Print detailed results
-        log.info("=" * 80)
-        log.info("RESULTS:")
-        log.info("=" * 80)
-        log.info(f"Duration: {stats['duration']:.2f} seconds")
-
+        # Print detailed results as a single log record
+        report = ["=" * 80, "RESULTS:", "=" * 80, f"Duration: {stats['duration']:.2f} seconds"]
         for i, dev_stats in enumerate(stats['devices'], 1):
-            log.info(f"Device {i} ({dev_stats['name']}):")
-            log.info(f"  Total frames: {dev_stats['total_frames']}")
-            log.info(f"  Overall drop rate: {dev_stats['drop_pct']:.2f}%")
+            report.append(f"Device {i} ({dev_stats['name']}):")
+            report.append(f"  Total frames: {dev_stats['total_frames']}")
+            report.append(f"  Overall drop rate: {dev_stats['drop_pct']:.2f}%")
             for stream_type, stream_stats in dev_stats['streams'].items():
-                log.info(f"  {stream_type}:")
-                log.info(f"    Received: {stream_stats['received']}/{stream_stats['expected']}")
-                log.info(f"    Dropped: {stream_stats['dropped']} ({stream_stats['drop_pct']:.2f}%)")
-
-        log.info("=" * 80)
+                report.append(f"  {stream_type}:")
+                report.append(f"    Received: {stream_stats['received']}/{stream_stats['expected']}")
+                report.append(f"    Dropped: {stream_stats['dropped']} ({stream_stats['drop_pct']:.2f}%)")
+        report.append("=" * 80)
+        log.info("\n".join(report))
 
         if success:
             log.info("PASS - Multi-stream test successful!")
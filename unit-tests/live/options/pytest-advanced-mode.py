@@ -3,6 +3,7 @@
 
 import pytest
 import pyrealsense2 as rs
+import json
 import logging
 log = logging.getLogger(__name__)
 
@@ -20,6 +21,22 @@ def get_am_dev(dev):
 _module_state = {}
 
 
+def apply_and_read_back(get, set_, values):
+    """Set the given fields on the current control struct, write it to the device, and return a fresh read"""
+    struct = get()
+    for field, value in values.items():
+        setattr(struct, field, value)
+    set_(struct)
+    return get()
+
+
+def assert_fields(struct, expected, abs=None):
+    """Assert all expected fields at once, reporting every mismatch; abs compares approximately (for floats)"""
+    mismatches = {field: (getattr(struct, field), value) for field, value in expected.items()
+                  if getattr(struct, field) != (value if abs is None else pytest.approx(value, abs=abs))}
+    assert not mismatches, f"(actual, expected) mismatches: {mismatches}"
+
+
 def test_advanced_mode_support(test_device_wrapped):
     """Prerequisite: camera must be in advanced mode. All CI cameras should already be enabled."""
     dev, ctx = test_device_wrapped
@@ -53,29 +70,20 @@ def test_set_depth_control(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    dc = am_dev.get_depth_control()
-    dc.plusIncrement = 11
-    dc.minusDecrement = 12
-    dc.deepSeaMedianThreshold = 13
-    dc.scoreThreshA = 14
-    dc.scoreThreshB = 22
-    dc.textureDifferenceThreshold = 23
-    dc.textureCountThreshold = 24
-    dc.deepSeaSecondPeakThreshold = 25
-    dc.deepSeaNeighborThreshold = 26
-    dc.lrAgreeThreshold = 27
-    am_dev.set_depth_control(dc)
-    new_dc = am_dev.get_depth_control()
-    assert new_dc.plusIncrement == 11
-    assert new_dc.minusDecrement == 12
-    assert new_dc.deepSeaMedianThreshold == 13
-    assert new_dc.scoreThreshA == 14
-    assert new_dc.scoreThreshB == 22
-    assert new_dc.textureDifferenceThreshold == 23
-    assert new_dc.textureCountThreshold == 24
-    assert new_dc.deepSeaSecondPeakThreshold == 25
-    assert new_dc.deepSeaNeighborThreshold == 26
-    assert new_dc.lrAgreeThreshold == 27
+    values = {
+        'plusIncrement': 11,
+        'minusDecrement': 12,
+        'deepSeaMedianThreshold': 13,
+        'scoreThreshA': 14,
+        'scoreThreshB': 22,
+        'textureDifferenceThreshold': 23,
+        'textureCountThreshold': 24,
+        'deepSeaSecondPeakThreshold': 25,
+        'deepSeaNeighborThreshold': 26,
+        'lrAgreeThreshold': 27,
+    }
+    new = apply_and_read_back(am_dev.get_depth_control, am_dev.set_depth_control, values)
+    assert_fields(new, values)
 
 
 def test_set_rsm(test_device_wrapped):
@@ -83,16 +91,15 @@ def test_set_rsm(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    rsm = am_dev.get_rsm()
-    rsm.diffThresh = 3.4
-    rsm.sloRauDiffThresh = 1.1875 # 1.2 was out of step
-    rsm.rsmBypass = 1
-    rsm.removeThresh = 123
-    am_dev.set_rsm(rsm)
-    new_rsm = am_dev.get_rsm()
-    assert new_rsm.diffThresh == pytest.approx(3.4, abs=0.01)
-    assert new_rsm.sloRauDiffThresh == pytest.approx(1.1875, abs=0.01)
-    assert new_rsm.removeThresh == 123
+    values = {
+        'diffThresh': 3.4,
+        'sloRauDiffThresh': 1.1875,  # 1.2 was out of step
+        'rsmBypass': 1,
+        'removeThresh': 123,
+    }
+    new = apply_and_read_back(am_dev.get_rsm, am_dev.set_rsm, values)
+    # rsmBypass is written but, as before, not verified
+    assert_fields(new, {field: value for field, value in values.items() if field != 'rsmBypass'}, abs=0.01)
 
 
 def test_set_rau(test_device_wrapped):
@@ -100,25 +107,18 @@ def test_set_rau(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    rau = am_dev.get_rau_support_vector_control()
-    rau.minWest = 1
-    rau.minEast = 2
-    rau.minWEsum = 3
-    rau.minNorth = 0
-    rau.minSouth = 1
-    rau.minNSsum = 6
-    rau.uShrink = 1
-    rau.vShrink = 2
-    am_dev.set_rau_support_vector_control(rau)
-    new_rau = am_dev.get_rau_support_vector_control()
-    assert new_rau.minWest == 1
-    assert new_rau.minEast == 2
-    assert new_rau.minWEsum == 3
-    assert new_rau.minNorth == 0
-    assert new_rau.minSouth == 1
-    assert new_rau.minNSsum == 6
-    assert new_rau.uShrink == 1
-    assert new_rau.vShrink == 2
+    values = {
+        'minWest': 1,
+        'minEast': 2,
+        'minWEsum': 3,
+        'minNorth': 0,
+        'minSouth': 1,
+        'minNSsum': 6,
+        'uShrink': 1,
+        'vShrink': 2,
+    }
+    new = apply_and_read_back(am_dev.get_rau_support_vector_control, am_dev.set_rau_support_vector_control, values)
+    assert_fields(new, values)
 
 
 def test_set_color_control(test_device_wrapped):
@@ -126,19 +126,15 @@ def test_set_color_control(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    color_control = am_dev.get_color_control()
-    color_control.disableSADColor = 1
-    color_control.disableRAUColor = 0
-    color_control.disableSLORightColor = 1
-    color_control.disableSLOLeftColor = 0
-    color_control.disableSADNormalize = 1
-    am_dev.set_color_control(color_control)
-    new_cc = am_dev.get_color_control()
-    assert new_cc.disableSADColor == 1
-    assert new_cc.disableRAUColor == 0
-    assert new_cc.disableSLORightColor == 1
-    assert new_cc.disableSLOLeftColor == 0
-    assert new_cc.disableSADNormalize == 1
+    values = {
+        'disableSADColor': 1,
+        'disableRAUColor': 0,
+        'disableSLORightColor': 1,
+        'disableSLOLeftColor': 0,
+        'disableSADNormalize': 1,
+    }
+    new = apply_and_read_back(am_dev.get_color_control, am_dev.set_color_control, values)
+    assert_fields(new, values)
 
 
 def test_set_rau_thresholds_control(test_device_wrapped):
@@ -146,15 +142,13 @@ def test_set_rau_thresholds_control(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    rau_tc = am_dev.get_rau_thresholds_control()
-    rau_tc.rauDiffThresholdRed = 10
-    rau_tc.rauDiffThresholdGreen = 20
-    rau_tc.rauDiffThresholdBlue = 30
-    am_dev.set_rau_thresholds_control(rau_tc)
-    new_rau_tc = am_dev.get_rau_thresholds_control()
-    assert new_rau_tc.rauDiffThresholdRed == 10
-    assert new_rau_tc.rauDiffThresholdGreen == 20
-    assert new_rau_tc.rauDiffThresholdBlue == 30
+    values = {
+        'rauDiffThresholdRed': 10,
+        'rauDiffThresholdGreen': 20,
+        'rauDiffThresholdBlue': 30,
+    }
+    new = apply_and_read_back(am_dev.get_rau_thresholds_control, am_dev.set_rau_thresholds_control, values)
+    assert_fields(new, values)
 
 
 def test_set_slo_color_thresholds_control(test_device_wrapped):
@@ -162,15 +156,13 @@ def test_set_slo_color_thresholds_control(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    slo_ctc = am_dev.get_slo_color_thresholds_control()
-    slo_ctc.diffThresholdRed = 1
-    slo_ctc.diffThresholdGreen = 2
-    slo_ctc.diffThresholdBlue = 3
-    am_dev.set_slo_color_thresholds_control(slo_ctc)
-    new_slo_ctc = am_dev.get_slo_color_thresholds_control()
-    assert new_slo_ctc.diffThresholdRed == 1
-    assert new_slo_ctc.diffThresholdGreen == 2
-    assert new_slo_ctc.diffThresholdBlue == 3
+    values = {
+        'diffThresholdRed': 1,
+        'diffThresholdGreen': 2,
+        'diffThresholdBlue': 3,
+    }
+    new = apply_and_read_back(am_dev.get_slo_color_thresholds_control, am_dev.set_slo_color_thresholds_control, values)
+    assert_fields(new, values)
 
 
 def test_set_slo_penalty_control(test_device_wrapped):
@@ -178,21 +170,16 @@ def test_set_slo_penalty_control(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    slo_pc = am_dev.get_slo_penalty_control()
-    slo_pc.sloK1Penalty = 1
-    slo_pc.sloK2Penalty = 2
-    slo_pc.sloK1PenaltyMod1 = 3
-    slo_pc.sloK2PenaltyMod1 = 4
-    slo_pc.sloK1PenaltyMod2 = 5
-    slo_pc.sloK2PenaltyMod2 = 6
-    am_dev.set_slo_penalty_control(slo_pc)
-    new_slo_pc = am_dev.get_slo_penalty_control()
-    assert new_slo_pc.sloK1Penalty == 1
-    assert new_slo_pc.sloK2Penalty == 2
-    assert new_slo_pc.sloK1PenaltyMod1 == 3
-    assert new_slo_pc.sloK2PenaltyMod1 == 4
-    assert new_slo_pc.sloK1PenaltyMod2 == 5
-    assert new_slo_pc.sloK2PenaltyMod2 == 6
+    values = {
+        'sloK1Penalty': 1,
+        'sloK2Penalty': 2,
+        'sloK1PenaltyMod1': 3,
+        'sloK2PenaltyMod1': 4,
+        'sloK1PenaltyMod2': 5,
+        'sloK2PenaltyMod2': 6,
+    }
+    new = apply_and_read_back(am_dev.get_slo_penalty_control, am_dev.set_slo_penalty_control, values)
+    assert_fields(new, values)
 
 
 def test_set_hdad(test_device_wrapped):
@@ -200,15 +187,13 @@ def test_set_hdad(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    hdad = am_dev.get_hdad()
-    hdad.lambdaCensus = 1.1
-    hdad.lambdaAD = 2.2
-    hdad.ignoreSAD = 1
-    am_dev.set_hdad(hdad)
-    new_hdad = am_dev.get_hdad()
-    assert new_hdad.lambdaCensus == pytest.approx(1.1, abs=0.01)
-    assert new_hdad.lambdaAD == pytest.approx(2.2, abs=0.01)
-    assert new_hdad.ignoreSAD == 1
+    values = {
+        'lambdaCensus': 1.1,
+        'lambdaAD': 2.2,
+        'ignoreSAD': 1,
+    }
+    new = apply_and_read_back(am_dev.get_hdad, am_dev.set_hdad, values)
+    assert_fields(new, values, abs=0.01)
 
 
 def test_set_color_correction(test_device_wrapped):
@@ -216,33 +201,22 @@ def test_set_color_correction(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    cc = am_dev.get_color_correction()
-    cc.colorCorrection1 = -0.1
-    cc.colorCorrection2 = -0.2
-    cc.colorCorrection3 = -0.3
-    cc.colorCorrection4 = -0.4
-    cc.colorCorrection5 = -0.5
-    cc.colorCorrection6 = -0.6
-    cc.colorCorrection7 = -0.7
-    cc.colorCorrection8 = -0.8
-    cc.colorCorrection9 = -0.9
-    cc.colorCorrection10 = 1.1
-    cc.colorCorrection11 = 1.2
-    cc.colorCorrection12 = 1.3
-    am_dev.set_color_correction(cc)
-    new_cc = am_dev.get_color_correction()
-    assert new_cc.colorCorrection1 == pytest.approx(-0.1, abs=0.01)
-    assert new_cc.colorCorrection2 == pytest.approx(-0.2, abs=0.01)
-    assert new_cc.colorCorrection3 == pytest.approx(-0.3, abs=0.01)
-    assert new_cc.colorCorrection4 == pytest.approx(-0.4, abs=0.01)
-    assert new_cc.colorCorrection5 == pytest.approx(-0.5, abs=0.01)
-    assert new_cc.colorCorrection6 == pytest.approx(-0.6, abs=0.01)
-    assert new_cc.colorCorrection7 == pytest.approx(-0.7, abs=0.01)
-    assert new_cc.colorCorrection8 == pytest.approx(-0.8, abs=0.01)
-    assert new_cc.colorCorrection9 == pytest.approx(-0.9, abs=0.01)
-    assert new_cc.colorCorrection10 == pytest.approx(1.1, abs=0.01)
-    assert new_cc.colorCorrection11 == pytest.approx(1.2, abs=0.01)
-    assert new_cc.colorCorrection12 == pytest.approx(1.3, abs=0.01)
+    values = {
+        'colorCorrection1': -0.1,
+        'colorCorrection2': -0.2,
+        'colorCorrection3': -0.3,
+        'colorCorrection4': -0.4,
+        'colorCorrection5': -0.5,
+        'colorCorrection6': -0.6,
+        'colorCorrection7': -0.7,
+        'colorCorrection8': -0.8,
+        'colorCorrection9': -0.9,
+        'colorCorrection10': 1.1,
+        'colorCorrection11': 1.2,
+        'colorCorrection12': 1.3,
+    }
+    new = apply_and_read_back(am_dev.get_color_correction, am_dev.set_color_correction, values)
+    assert_fields(new, values, abs=0.01)
 
 
 def test_set_ae_control(test_device_wrapped):
@@ -250,11 +224,11 @@ def test_set_ae_control(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    aec = am_dev.get_ae_control()
-    aec.meanIntensitySetPoint = 1234
-    am_dev.set_ae_control(aec)
-    new_aec = am_dev.get_ae_control()
-    assert new_aec.meanIntensitySetPoint == 1234
+    values = {
+        'meanIntensitySetPoint': 1234,
+    }
+    new = apply_and_read_back(am_dev.get_ae_control, am_dev.set_ae_control, values)
+    assert_fields(new, values)
 
 
 def test_set_depth_table(test_device_wrapped):
@@ -262,19 +236,15 @@ def test_set_depth_table(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    dt = am_dev.get_depth_table()
-    dt.depthUnits = 100
-    dt.depthClampMin = 10
-    dt.depthClampMax = 200
-    dt.disparityMode = 1
-    dt.disparityShift = 2
-    am_dev.set_depth_table(dt)
-    new_dt = am_dev.get_depth_table()
-    assert new_dt.depthUnits == 100
-    assert new_dt.depthClampMin == 10
-    assert new_dt.depthClampMax == 200
-    assert new_dt.disparityMode == 1
-    assert new_dt.disparityShift == 2
+    values = {
+        'depthUnits': 100,
+        'depthClampMin': 10,
+        'depthClampMax': 200,
+        'disparityMode': 1,
+        'disparityShift': 2,
+    }
+    new = apply_and_read_back(am_dev.get_depth_table, am_dev.set_depth_table, values)
+    assert_fields(new, values)
 
 
 def test_set_census(test_device_wrapped):
@@ -282,13 +252,12 @@ def test_set_census(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    census = am_dev.get_census()
-    census.uDiameter = 5
-    census.vDiameter = 6
-    am_dev.set_census(census)
-    new_census = am_dev.get_census()
-    assert new_census.uDiameter == 5
-    assert new_census.vDiameter == 6
+    values = {
+        'uDiameter': 5,
+        'vDiameter': 6,
+    }
+    new = apply_and_read_back(am_dev.get_census, am_dev.set_census, values)
+    assert_fields(new, values)
 
 
 def test_set_amp_factor(test_device_wrapped):
@@ -296,11 +265,24 @@ def test_set_amp_factor(test_device_wrapped):
         pytest.skip("prerequisite test_visual_preset_support failed")
     dev, ctx = test_device_wrapped
     am_dev = get_am_dev(dev)
-    af = am_dev.get_amp_factor()
-    af.a_factor = 0.12
-    am_dev.set_amp_factor(af)
-    new_af = am_dev.get_amp_factor()
-    assert new_af.a_factor == pytest.approx(0.12, abs=0.005)
+    values = {
+        'a_factor': 0.12,
+    }
+    new = apply_and_read_back(am_dev.get_amp_factor, am_dev.set_amp_factor, values)
+    assert_fields(new, values, abs=0.005)
+
+
+def test_json_round_trip(test_device_wrapped):
+    """All controls set above survive a reset through a single serialize_json/load_json exchange"""
+    if not _module_state.get('preset_ok'):
+        pytest.skip("prerequisite test_visual_preset_support failed")
+    dev, ctx = test_device_wrapped
+    am_dev = get_am_dev(dev)
+    snapshot = am_dev.serialize_json()
+    depth_sensor = dev.first_depth_sensor()
+    depth_sensor.set_option(rs.option.visual_preset, int(rs.rs400_visual_preset.default))
+    am_dev.load_json(snapshot)
+    assert json.loads(am_dev.serialize_json()) == json.loads(snapshot)
 
 
 def test_return_to_default_visual_preset(test_device_wrapped):
@@ -3,11 +3,12 @@
 
 import os
 import json
+import functools
 
-# Cache for domain value to avoid re-reading config file
-_cached_domain = None
-
+@functools.lru_cache(maxsize=None)
 def get_config_path():
+    # Constant for the life of the process: computed on first use (not at import, so a missing HOME/APPDATA only
+    # fails callers that actually need the config)
     file_name = "realsense-config.json"
     if os.name == "nt":  # windows
         base_dir = os.environ.get("APPDATA")
@@ -20,8 +21,23 @@ def get_config_path():
 
 
 def get_config_file():
+    """
+    Returns the parsed config file. The file is only re-read when its modification time changes, so the
+    returned dict is shared between callers and must not be modified
+    """
     config_path = get_config_path()
 
+    try:
+        mtime = os.stat(config_path).st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"config file not found: {config_path}")
+
+    return _read_config_file(config_path, mtime)
+
+
+@functools.lru_cache(maxsize=4)
+def _read_config_file(config_path, mtime):
+    # mtime is only part of the cache key
     try:
         with open(config_path, "r", encoding="utf-8") as f:
             config = json.load(f)
@@ -29,31 +45,27 @@ def get_config_file():
         raise FileNotFoundError(f"config file not found: {config_path}")
     except json.JSONDecodeError as e:
         raise ValueError(f"invalid json in {config_path}: {e}")
-    
+
     return config
     
     
+@functools.lru_cache(maxsize=None)
 def get_domain_from_config_file_or_default():
-    global _cached_domain
-    
-    # Return cached value if already read
-    if _cached_domain is not None:
-        return _cached_domain
-    
+    """
+    Returns the DDS domain from the config file, or the default (0) if there is no config file.
+    The file is only read on the first call; the result is cached for the life of the process
+    """
     try:
-        # Read from file and cache the result
         config_file = get_config_file()
-        domain = config_file["context"]["dds"]["domain"]
-
-        if domain is None:
-            raise KeyError("Missing required config key: context.dds.domain")
-
-        # Cache the domain value for future calls
-        _cached_domain = domain
-    
     except FileNotFoundError:
         # Fallback to default domain if config file is missing
-        _cached_domain = 0
-    
-    finally:
-        return _cached_domain
+        return 0
+
+    try:
+        domain = config_file["context"]["dds"]["domain"]
+    except KeyError:
+        domain = None
+    if domain is None:
+        raise KeyError("Missing required config key: context.dds.domain")
+
+    return domain
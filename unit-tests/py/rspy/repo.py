@@ -56,14 +56,28 @@ def find_pyrs_dir():
         return pyrs_dir
 
 
+# (source, name) -> path of executables already found by find_built_exe()
+_built_exes = {}
+
+
 def find_built_exe( source, name ):
     """
     Find an executable that was built in the repo
+    Successful lookups are remembered for the rest of the session; misses are retried every time
 
     :param source: The location of the exe's project, e.g. tools/convert
     :param name: The name of the exe, without any platform-specific extensions like .exe
     :return: The full path, or None, of the exe
     """
+    exe = _built_exes.get( (source, name) )
+    if exe is None or not os.path.isfile( exe ):
+        exe = _find_built_exe( source, name )
+        if exe:
+            _built_exes[source, name] = exe
+    return exe
+
+
+def _find_built_exe( source, name ):
     if platform.system() != 'Linux':
         name += '.exe'
     tried = []
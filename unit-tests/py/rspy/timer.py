@@ -36,3 +36,17 @@ class Timer:
         self._sw.reset(time.perf_counter() - (self._delta + 0.00001))
 
 
+def wait_for( condition, timeout ):
+    """
+    Poll condition() until it returns True or timeout [sec] passes.
+    Starts with a short sleep so quick events are noticed quickly, then backs off up to 0.2 sec.
+    :return: True if condition() was met, False on timeout
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep( delay )
+        delay = min( delay * 1.5, 0.2 )
+    return True
@@ -13,10 +13,14 @@ import os
 import subprocess
 import re
 import platform
+import collections
+import functools
+import shutil
 import pyrealsense2 as rs
 import pyrsutils as rsutils
 from rspy import log, test, file, repo
 import time
+import threading
 import argparse
 
 # Parse command-line arguments
@@ -26,26 +30,74 @@ parser.add_argument('--custom-fw-d555', type=str, help='Path to custom D555 firm
 args = parser.parse_args()
 
 
-def wait_for_reboot( same_version ):
+def watch_for_arrival( serial_number ):
+    """
+    Start watching for the device with the given serial number to (re-)enumerate. Must be called before
+    rs-fw-update runs: it only exits once the device is back, by which time the arrival event has fired.
+    :return: (context, event) -- the context must be kept alive; the event is set on arrival
+    """
+    arrived = threading.Event()
+    def on_devices_changed( info ):
+        for dev in info.get_new_devices():
+            try:
+                if dev.get_info( rs.camera_info.serial_number ) == serial_number:
+                    arrived.set()
+            except RuntimeError:
+                pass  # e.g. a device in recovery mode, without a serial number
+    ctx = rs.context()
+    ctx.set_devices_changed_callback( on_devices_changed )
+    return ctx, arrived
+
+
+def wait_for_reboot( watcher, same_version ):
     """
     Wait for the camera to finish rebooting after a FW update.
     The test exit flow may cut USB power (via hub port disable), so we must ensure
     the device has had enough time to complete its reboot before we exit.
-    When updating to a different version, FW may need time to flash a new ISP FW.
+    When updating to a different version, FW may need time to flash a new ISP FW, which
+    happens after the device is back so we have to sleep through it. Otherwise the reboot is
+    done once the device with our serial number re-enumerates: we wait for its arrival, for
+    at most the same few seconds.
+    :param watcher: what watch_for_arrival() returned, before the update was started
     """
-    sleep_time = 60 if not same_version else 3
-    log.d( "Waiting", sleep_time, "seconds for device to finish rebooting after FW update..." )
-    time.sleep( sleep_time )
-
-
-def send_hardware_monitor_command(device, command):
-    # byte_index = -1
-    raw_result = rs.debug_protocol(device).send_and_receive_raw_data(command)
+    ctx, arrived = watcher
+    try:
+        if not same_version:
+            log.d( "Waiting 60 seconds for device to finish rebooting after FW update..." )
+            time.sleep( 60 )
+            return
+        sleep_time = 3
+        log.d( "Waiting up to", sleep_time, "seconds for device to finish rebooting after FW update..." )
+        if not arrived.wait( sleep_time ):
+            log.d( "device did not re-enumerate within", sleep_time, "seconds" )
+    finally:
+        ctx.set_devices_changed_callback( lambda info: None )
+
+
+# opcode -> built command; a parameterless command's bytes don't depend on the device, so each is only built once
+_hw_monitor_commands = {}
+
+def send_hardware_monitor_command(device, opcode):
+    """
+    Build and send a parameterless hw-monitor command, through a single debug_protocol handle
+    :return: the response data, without the opcode header
+    """
+    debug_protocol = rs.debug_protocol(device)
+    command = _hw_monitor_commands.get(opcode)
+    if command is None:
+        command = _hw_monitor_commands[opcode] = debug_protocol.build_command(opcode)
+    raw_result = debug_protocol.send_and_receive_raw_data(command)
 
     return raw_result[4:]
 
-import os
-import re
+
+# Match *last* 4 numeric groups before .img/.bin
+# following matching patterns for cases:
+# FlashGeneratedImage_Image5_16_7_0.bin -> 5.16.7
+# FlashGeneratedImage_RELEASE_DS5_5_16_3_1.bin -> 5.16.3.1
+VERSION_UNDERSCORE_RE = re.compile(r'(\d+)_(\d+)_(\d+)_(\d+)\.(bin|img)$')
+# Match patterns like rvp-flash-dfu-release-7.56.37749.4831.img -> 7.56.37749.4831
+VERSION_DOTTED_RE = re.compile(r'-(\d+)\.(\d+)\.(\d+)\.(\d+)\.(bin|img)$')
 
 def extract_version_from_filename(file_path):
     """
@@ -66,14 +118,9 @@ def extract_version_from_filename(file_path):
 
     filename = os.path.basename(file_path)
 
-    # Match *last* 4 numeric groups before .img/.bin
-    # following matching patterns for cases:
-    # FlashGeneratedImage_Image5_16_7_0.bin -> 5.16.7
-    # FlashGeneratedImage_RELEASE_DS5_5_16_3_1.bin -> 5.16.3.1
-    match = re.search(r'(\d+)_(\d+)_(\d+)_(\d+)\.(bin|img)$', filename)
+    match = VERSION_UNDERSCORE_RE.search(filename)
     if not match:
-        # Match patterns like rvp-flash-dfu-release-7.56.37749.4831.img -> 7.56.37749.4831
-        match = re.search(r'-(\d+)\.(\d+)\.(\d+)\.(\d+)\.(bin|img)$', filename)
+        match = VERSION_DOTTED_RE.search(filename)
         if not match:
             log.i(f"Version not found in filename: {filename}")
             return None
@@ -87,41 +134,88 @@ def extract_version_from_filename(file_path):
         return rsutils.version(f"{a}.{b}.{c}.{d}")
 
 
-def get_downgrade_counter(device):
-    product_line = device.get_info(rs.camera_info.product_line)
-
+def get_downgrade_counter(device, product_line):
     if product_line == "D400":
         opcode = 0x93  # DFU_READ_CNT — reads the actual downgrade counter from flash payload header
-        raw_cmd = rs.debug_protocol(device).build_command(opcode)
-        counter = send_hardware_monitor_command(device, raw_cmd)
+        counter = send_hardware_monitor_command(device, opcode)
         return counter[0] | (counter[1] << 8)  # uint16_t little-endian
     if product_line == "D500":
         return 0  # D500 do not have downgrade counter
     log.f( "Incompatible product line:", product_line )  # calls sys.exit(1)
 
 
-def reset_downgrade_counter( device ):
-    product_line = device.get_info( rs.camera_info.product_line )
-
+def reset_downgrade_counter( device, product_line ):
     if product_line == "D400":
         opcode = 0x86  # DFU_RESET_CNT — resets the downgrade counter in flash payload header
-        raw_cmd = rs.debug_protocol(device).build_command(opcode)
-        send_hardware_monitor_command( device, raw_cmd )
+        send_hardware_monitor_command( device, opcode )
         return
     if product_line == "D500":
         return  # D500 do not have downgrade counter
     log.f( "Incompatible product line:", product_line )  # calls sys.exit(1)
 
-# find the update tool exe
-fw_updater_exe = None
-fw_updater_exe_regex = r'(^|/)rs-fw-update'
-if platform.system() == 'Windows':
-    fw_updater_exe_regex += r'\.exe'
-fw_updater_exe_regex += '$'
-for tool in file.find( repo.build, fw_updater_exe_regex ):
-    fw_updater_exe = os.path.join( repo.build, tool )
-if not fw_updater_exe:
-    log.f( "Could not find the update tool file (rs-fw-update.exe)" )
+# file.find() yields paths relative to the build dir; re.compile() passes an already-compiled pattern through as-is
+FW_UPDATER_EXE_RE = re.compile( r'(^|/)rs-fw-update' + ( r'\.exe' if platform.system() == 'Windows' else '' ) + '$' )
+
+@functools.lru_cache( maxsize=1 )
+def find_rs_fw_update_tool():
+    """
+    Find the rs-fw-update exe, probing the well-known build locations before walking the whole build tree
+    :return: the full path to the exe, or None if not found
+    """
+    tool = repo.find_built_exe( 'tools/fw-update', 'rs-fw-update' )
+    if tool:
+        return tool
+    if repo.build:
+        for tool in file.find( repo.build, FW_UPDATER_EXE_RE ):
+            return os.path.join( repo.build, tool )
+    # last resort: an installed tool on the PATH (no need to spawn 'which'/'where' for it)
+    return shutil.which( 'rs-fw-update' )
+
+
+def get_fw_updater_exe():
+    """
+    Looked up only once we know we're going to run it, so the same-version skip path doesn't pay for the search
+    """
+    fw_updater_exe = find_rs_fw_update_tool()
+    if not fw_updater_exe:
+        log.f( "Could not find the update tool file (rs-fw-update.exe)" )
+    return fw_updater_exe
+
+def prefetch_image( image_file ):
+    """
+    Ask the kernel to start reading the FW image into the page cache, so rs-fw-update doesn't stall on disk reads
+    """
+    if not hasattr( os, 'posix_fadvise' ):  # Windows
+        return
+    try:
+        fd = os.open( image_file, os.O_RDONLY )
+        try:
+            os.posix_fadvise( fd, 0, os.fstat( fd ).st_size, os.POSIX_FADV_WILLNEED )
+        finally:
+            os.close( fd )
+    except OSError as e:
+        log.d( 'failed to prefetch', image_file, ':', e )
+
+
+def run_fw_updater( cmd, tail_lines=100 ):
+    """
+    Run rs-fw-update, streaming its (long, progress-laden) output instead of buffering all of it until it exits.
+    Lines are echoed as they arrive in debug mode only; the last tail_lines are logged if it fails.
+    :return: the finished Popen object (check its returncode)
+    """
+    log.d( 'running:', cmd )
+    sys.stdout.flush()
+    tail = collections.deque( maxlen=tail_lines )
+    debug = log.is_debug_on()
+    with subprocess.Popen( cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1 ) as proc:
+        for line in proc.stdout:
+            line = line.rstrip()
+            tail.append( line )
+            if debug:
+                log.d( line )
+    if proc.returncode and not debug:
+        log.i( '\n'.join( tail ) )
+    return proc
 
 device, ctx = test.find_first_device_or_exit()
 product_line = device.get_info( rs.camera_info.product_line )
@@ -157,10 +251,10 @@ if device.is_in_recovery_mode():
     try:
         # always flash signed fw when device on recovery before flashing anything else
         image_file = custom_fw_path
-        cmd = [fw_updater_exe, '-r', '-f', image_file]
+        cmd = [get_fw_updater_exe(), '-r', '-f', image_file]
+        prefetch_image( image_file )
         del device, ctx
-        log.d( 'running:', cmd )
-        subprocess.run( cmd )
+        run_fw_updater( cmd )
         recovered = True
 
         if 'jetson' in test.context:
@@ -199,38 +293,41 @@ if current_fw_version == custom_fw_version:
         test.finish()
         test.print_results_and_exit()
 
-downgrade_counter = get_downgrade_counter( device )
+downgrade_counter = get_downgrade_counter( device, product_line )
 log.d( 'downgrade counter:', downgrade_counter )
 if downgrade_counter == 0xFFFF:
     log.d( 'downgrade counter is uninitialized (0xFFFF), skipping reset' )
     downgrade_counter = 0
 elif downgrade_counter >= 19:
     log.d( 'resetting downgrade counter (was', str(downgrade_counter) + ')' )
-    reset_downgrade_counter( device )
+    reset_downgrade_counter( device, product_line )
     log.d( 'sleeping for 3 sec...' )
     time.sleep( 3 )
-    downgrade_counter = get_downgrade_counter( device )
+    downgrade_counter = get_downgrade_counter( device, product_line )
     log.d( 'downgrade counter after reset is:', str(downgrade_counter))
     test.check_equal( downgrade_counter, 0 )
     downgrade_counter = 0
 
 image_file = custom_fw_path
 
-cmd = [fw_updater_exe, '-f', image_file]
+cmd = [get_fw_updater_exe(), '-f', image_file]
 # Add '-u' only if the path doesn't include 'signed'
 if ('signed' not in custom_fw_path.lower()
         and "d555" not in product_name.lower()): # currently -u is not supported for D555
     cmd.insert(1, '-u')
 
+prefetch_image( image_file )
+
 # for DDS devices we need to close device and context to detect it back after FW update
+serial_number = device.get_info( rs.camera_info.serial_number )
 del device, ctx
-log.d( 'running:', cmd )
-sys.stdout.flush()
-result = subprocess.run( cmd )   # may throw
+watcher = watch_for_arrival( serial_number )
+result = run_fw_updater( cmd )   # may throw
 
 # Wait for the camera to finish rebooting before doing anything else;
 # the test exit flow may cut USB power (hub port disable) so we must not exit mid-reboot
-wait_for_reboot( same_version )
+wait_for_reboot( watcher, same_version )
+del watcher
 
 if result.returncode != 0:
     log.e( 'rs-fw-update returned exit code', result.returncode )
@@ -247,7 +344,7 @@ if device.supports( rs.camera_info.camera_locked ) and device.get_info( rs.camer
     log.w( 'Device is flash-locked' )
 
 test.check_equal(current_fw_version, custom_fw_version)
-new_downgrade_counter = get_downgrade_counter( device )
+new_downgrade_counter = get_downgrade_counter( device, product_line )
 log.d( 'downgrade counter after update:', new_downgrade_counter )
 
 test.finish()
@@ -17,14 +17,21 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 _realsense_manager = None
 _webrtc_manager = None
 
-def get_realsense_manager() -> RealSenseManager:
+# The getters are async so FastAPI awaits them on the event loop instead of offloading every request's
+# dependency resolution to its threadpool; nothing in them suspends, so the lazy creation can't race either
+async def get_realsense_manager() -> RealSenseManager:
     global _realsense_manager
     if _realsense_manager is None:
         _realsense_manager = RealSenseManager(sio)
     return _realsense_manager
 
-def get_webrtc_manager() -> WebRTCManager:
+async def get_webrtc_manager() -> WebRTCManager:
     global _webrtc_manager
     if _webrtc_manager is None:
-        _webrtc_manager = WebRTCManager(get_realsense_manager())
-    return _webrtc_manager
\ No newline at end of file
+        _webrtc_manager = WebRTCManager(await get_realsense_manager())
+    return _webrtc_manager
+
+def shutdown_managers() -> None:
+    """Release resources held by the managers that were created, on application shutdown"""
+    if _realsense_manager is not None:
+        _realsense_manager.shutdown_executors()
@@ -1,7 +1,9 @@
 # License: Apache 2.0. See LICENSE file in root directory.
 # Copyright(c) 2026 RealSense, Inc. All Rights Reserved.
 
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, Response
+from pydantic import TypeAdapter
 from typing import List
 
 
@@ -11,6 +13,10 @@ from app.api.dependencies import get_realsense_manager
 
 router = APIRouter()
 
+# The manager already returns validated models: serializing them straight to JSON bytes in pydantic-core skips
+# FastAPI's response_model re-validation and its Python-side json.dumps (response_model still documents the schema)
+_sensor_list_adapter = TypeAdapter(List[SensorInfo])
+
 @router.get("/", response_model=List[SensorInfo])
 async def get_sensors(
     device_id: str,
@@ -19,10 +25,13 @@ async def get_sensors(
     """
     Get a list of all sensors for a specific RealSense device.
     """
-    try:
-        return rs_manager.get_sensors(device_id)
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
+    # Building the list blocks on the SDK: run it on the device's worker thread, not the event loop.
+    # A RealSenseError (e.g. unknown device -> 404) is turned into its response by the app's exception handler
+    loop = asyncio.get_running_loop()
+    sensors = await loop.run_in_executor(
+        rs_manager.get_device_executor(device_id), rs_manager.get_sensors, device_id
+    )
+    return Response(content=_sensor_list_adapter.dump_json(sensors), media_type="application/json")
 
 @router.get("/{sensor_id}", response_model=SensorInfo)
 async def get_sensor(
@@ -33,7 +42,8 @@ async def get_sensor(
     """
     Get details of a specific sensor for a RealSense device.
     """
-    try:
-        return rs_manager.get_sensor(device_id, sensor_id)
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
\ No newline at end of file
+    loop = asyncio.get_running_loop()
+    sensor = await loop.run_in_executor(
+        rs_manager.get_device_executor(device_id), rs_manager.get_sensor, device_id, sensor_id
+    )
+    return Response(content=sensor.model_dump_json(), media_type="application/json")
\ No newline at end of file
@@ -3,6 +3,7 @@
 
 import asyncio
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import time
 import logging
 from typing import Dict, List, Optional, Any, Tuple, Set
@@ -28,6 +29,10 @@ from app.services.metadata_socket_server import MetadataSocketServer
 
 FW_STATUS_UNKNOWN = "unknown"
 
+# How long (seconds) a device's get_sensors() result is reused; long enough to absorb UI polling bursts, short
+# enough that option values the device changes on its own (e.g. auto-exposure) don't go stale
+SENSOR_CACHE_TTL = 0.5
+
 
 class RealSenseManager:
     # Class-level event loop reference for async operations from sync contexts
@@ -74,6 +79,14 @@ class RealSenseManager:
 
         # Device discovery cache metadata
         self._last_refresh_time: float = 0.0
+        # get_sensors() snapshots: device_id -> (time.monotonic() when built, sensors); guarded by self.lock
+        self._sensor_cache: Dict[str, Tuple[float, List[SensorInfo]]] = {}
+        # Bumped on every invalidation, so a snapshot that was being built meanwhile isn't stored: device_id -> count
+        self._sensor_cache_generation: Dict[str, int] = {}
+        # One worker thread per device for blocking queries made on behalf of async endpoints. Guarded by its own
+        # lock, not self.lock: it is taken on the event loop, and self.lock is held across slow SDK calls
+        self._device_executors: Dict[str, ThreadPoolExecutor] = {}
+        self._executors_lock = threading.Lock()
 
         # --- Per-Sensor Streaming State (Sensor API) ---
         # Tracks which mode each device is using: "pipeline", "sensor", or "idle"
@@ -115,6 +128,7 @@ class RealSenseManager:
             for device_id in list(self.devices.keys()):
                 if device_id not in self.pipelines:
                     del self.devices[device_id]
+                    self._invalidate_sensor_cache(device_id)
                     if device_id in self.device_infos:
                         del self.device_infos[device_id]
 
@@ -195,6 +209,13 @@ class RealSenseManager:
 
                 self.device_infos[device_id] = device_info
 
+            # Devices that didn't come back no longer need their worker thread
+            with self._executors_lock:
+                gone = [d for d in self._device_executors if d not in self.devices]
+                executors = [self._device_executors.pop(d) for d in gone]
+            for executor in executors:
+                executor.shutdown(wait=False)
+
             # Update cache timestamp after a successful refresh
             import time
             self._last_refresh_time = time.perf_counter()
@@ -245,7 +266,9 @@ class RealSenseManager:
                     status_code=404, detail=f"Device {device_id} not found"
                 )
 
-        dev = self.devices[device_id]
+        dev = self._get_device(device_id)
+        with self.lock:
+            self._invalidate_sensor_cache(device_id)
         try:
             dev.hardware_reset()
             return True
@@ -254,16 +277,62 @@ class RealSenseManager:
                 status_code=500, detail=f"Failed to reset device: {str(e)}"
             )
 
+    def _get_device(self, device_id: str) -> rs.device:
+        """Look up a known device; refresh_devices() rebuilds the map, possibly on another thread, so under the lock"""
+        with self.lock:
+            dev = self.devices.get(device_id)
+        if dev is None:
+            raise RealSenseError(status_code=404, detail=f"Device {device_id} not found")
+        return dev
+
+    def _invalidate_sensor_cache(self, device_id: str) -> None:
+        """Drop the device's get_sensors() snapshot; call with self.lock held"""
+        self._sensor_cache.pop(device_id, None)
+        self._sensor_cache_generation[device_id] = self._sensor_cache_generation.get(device_id, 0) + 1
+
+    def get_device_executor(self, device_id: str) -> Optional[ThreadPoolExecutor]:
+        """
+        Executor for running blocking queries on a device off the event loop, one worker thread per device so a
+        slow device doesn't hold up queries on the others. Only the sensor queries go through it: it does not
+        serialize them against other manager calls on the same device. Returns None (the loop's default executor)
+        for unknown ids, so arbitrary ids from requests don't each get a thread.
+        Called on the event loop, so it never waits on self.lock; checking self.devices without it is racy only
+        against a refresh, and the worker's own lookup still raises for a device that is gone.
+        """
+        if device_id not in self.devices:
+            return None
+        with self._executors_lock:
+            executor = self._device_executors.get(device_id)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"rs-{device_id}")
+                self._device_executors[device_id] = executor
+            return executor
+
+    def shutdown_executors(self) -> None:
+        """Stop the per-device worker threads (on application shutdown)"""
+        with self._executors_lock:
+            executors = list(self._device_executors.values())
+            self._device_executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=False)
+
     def get_sensors(self, device_id: str) -> List[SensorInfo]:
         """Get all sensors for a device"""
         if device_id not in self.devices:
             self.refresh_devices()
-        if device_id not in self.devices:
+
+        # Building the list queries every profile and option of every sensor; reuse a recent snapshot
+        with self.lock:
+            dev = self.devices.get(device_id)
+            cached = self._sensor_cache.get(device_id)
+            generation = self._sensor_cache_generation.get(device_id, 0)
+        if dev is None:
             raise RealSenseError(
                 status_code=404, detail=f"Device {device_id} not found"
             )
+        if cached is not None and time.monotonic() - cached[0] < SENSOR_CACHE_TTL:
+            return list(cached[1])
 
-        dev = self.devices[device_id]
         sensors = []
 
         for i, sensor in enumerate(dev.sensors):
@@ -351,7 +420,11 @@ class RealSenseManager:
 
             sensors.append(sensor_info)
 
-        return sensors
+        with self.lock:
+            # Not if an option write or a refresh invalidated the device while this was being built
+            if self._sensor_cache_generation.get(device_id, 0) == generation:
+                self._sensor_cache[device_id] = (time.monotonic(), sensors)
+        return list(sensors)
 
     def get_sensor(self, device_id: str, sensor_id: str) -> SensorInfo:
         """Get a specific sensor by ID"""
@@ -370,7 +443,7 @@ class RealSenseManager:
                     status_code=404, detail=f"Device {device_id} not found"
                 )
 
-        dev = self.devices[device_id]
+        dev = self._get_device(device_id)
 
         # Parse sensor index from sensor_id
         try:
@@ -553,6 +626,18 @@ class RealSenseManager:
         self, device_id: str, sensor_id: str, option_id: str, value: Any
     ) -> bool:
         """Set an option value for a sensor"""
+        try:
+            return self._set_sensor_option(device_id, sensor_id, option_id, value)
+        finally:
+            # The next get_sensors() must report the new value. Invalidated after the write, so a snapshot built
+            # concurrently from the old value is discarded rather than cached
+            with self.lock:
+                if device_id in self.devices:
+                    self._invalidate_sensor_cache(device_id)
+
+    def _set_sensor_option(
+        self, device_id: str, sensor_id: str, option_id: str, value: Any
+    ) -> bool:
         if device_id not in self.devices:
             self.refresh_devices()
             if device_id not in self.devices:
@@ -560,7 +645,7 @@ class RealSenseManager:
                     status_code=404, detail=f"Device {device_id} not found"
                 )
 
-        dev = self.devices[device_id]
+        dev = self._get_device(device_id)
 
         # Parse sensor index from sensor_id
         try:
@@ -239,34 +239,27 @@ class WebRTCManager:
 
     async def close_session(self, session_id: str) -> bool:
         """Close a WebRTC session."""
+        # Remove session; the peer connection is closed outside the lock so the teardown doesn't hold up other sessions
         async with self.lock:
-            if session_id not in self.sessions:
-                return False
-
-            # Close peer connection
-            try:
-                await self.sessions[session_id]["pc"].close()
-            except Exception:
-                pass
+            session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
 
-            # Remove session
-            del self.sessions[session_id]
-            return True
+        # Close peer connection
+        try:
+            await session["pc"].close()
+        except Exception:
+            pass
+        return True
 
     async def _cleanup_sessions(self):
         """Clean up old or disconnected sessions."""
+        # Remove sessions older than 1 hour
         async with self.lock:
             now = time.time()
-            session_ids = list(self.sessions.keys())
-
-            for session_id in session_ids:
-                session = self.sessions[session_id]
-
-                # Remove sessions older than 1 hour
-                if now - session["created_at"] > 3600:
-                    try:
-                        await session["pc"].close()
-                    except Exception:
-                        pass
+            stale = [session_id for session_id, session in self.sessions.items()
+                     if now - session["created_at"] > 3600]
+            stale_pcs = [self.sessions.pop(session_id)["pc"] for session_id in stale]
 
-                    del self.sessions[session_id]
\ No newline at end of file
+        # Close their peer connections concurrently, outside the lock
+        await asyncio.gather(*(pc.close() for pc in stale_pcs), return_exceptions=True)
\ No newline at end of file
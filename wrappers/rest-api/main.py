@@ -8,6 +8,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.router import api_router
+from app.api.dependencies import shutdown_managers
 from app.core.errors import setup_exception_handlers
 from config import settings
 import socketio
@@ -45,6 +46,12 @@ async def startup_event():
     RealSenseManager.set_event_loop(loop)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the managers' worker threads."""
+    shutdown_managers()
+
+
 # --- Combine FastAPI and Socket.IO into a single ASGI App ---
 # Mount the Socket.IO app (`sio`) onto the FastAPI app (`app`)
 # The result `combined_app` is what Uvicorn will run.